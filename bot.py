@@ -12,6 +12,9 @@ from discord.ext import commands, tasks
 from discord import app_commands
 
 from utils import env
+from utils import http_client
+from utils.ftp_uploader import close_ftp_pool
+from utils.image_optimizer import shutdown_image_pool
 
 # ---------------- LOGGING GLOBAL ----------------
 logging.basicConfig(
@@ -60,6 +63,7 @@ class MyBot(commands.Bot):
         ]
         self._idx = 0
         self.synced_once = False
+        self.http_session = None  # aiohttp compartilhado (criado no setup_hook)
 
     # ---------- Task com log seguro ----------
     def create_task(self, coro, *, name: Optional[str] = None):
@@ -162,6 +166,9 @@ class MyBot(commands.Bot):
         asyncio.get_running_loop().set_exception_handler(self._loop_exc_handler)
         self._install_signals()
 
+        # 🌐 Pool HTTP único (avatares, anexos, CDN) — reaproveita conexões quentes
+        self.http_session = http_client.create_session()
+
         for ext in COGS:
             try:
                 await self.load_extension(ext)
@@ -174,6 +181,14 @@ class MyBot(commands.Bot):
 
         self.create_task(self._sync_tree(delay=4), name="delayed_sync")
 
+    async def close(self):
+        await super().close()
+        if self.http_session is not None and not self.http_session.closed:
+            await self.http_session.close()
+            log.info("🌐 Sessão HTTP encerrada")
+        await close_ftp_pool()
+        shutdown_image_pool()
+
     async def on_ready(self):
         u = self.user
         log.info(f"✅ Logado como {u} ({u.id})")
@@ -1,11 +1,11 @@
 from __future__ import annotations
 import datetime as dt
-import asyncio
 from typing import Optional, List
 
 import discord
 from discord.ext import commands
 from utils import env  # <--- usa o teu sistema .env
+from utils import ratelimit
 
 
 # =================== Utils ===================
@@ -47,12 +47,12 @@ def _boost_str(member: discord.Member) -> str:
     return f"Sim desde {_fmt_dt_utc(member.premium_since)}" if member.premium_since else "Não"
 
 async def _safe_send(destination, /, **kwargs):
+    # o limitador compartilhado espera a vaga do canal; a 2ª tentativa entra na fila de novo
     try:
-        return await destination.send(**kwargs)
+        return await ratelimit.send(destination, **kwargs)
     except discord.HTTPException:
         try:
-            await asyncio.sleep(0.6)
-            return await destination.send(**kwargs)
+            return await ratelimit.send(destination, **kwargs)
         except Exception:
             return None
     except Exception:
@@ -188,12 +188,11 @@ class EntryExit(commands.Cog):
         cargo = member.guild.get_role(self.cargo_auto)
         if cargo:
             try:
-                await member.add_roles(cargo, reason="Entrada: cargo automático")
+                await ratelimit.call("member", member.guild.id, member.add_roles, cargo, reason="Entrada: cargo automático")
             except Exception:
                 pass
 
         await self._send_public_welcome(member)
-        await asyncio.sleep(0.3)
         await self._send_join_log(member)
 
         # DM opcional
@@ -210,7 +209,7 @@ class EntryExit(commands.Cog):
             if member.display_avatar:
                 dm_embed.set_thumbnail(url=member.display_avatar.url)
             dm_embed.set_footer(text=self.footer_nome, icon_url=self.footer_logo or None)
-            await member.send(embed=dm_embed)
+            await ratelimit.send(member, embed=dm_embed)
         except Exception:
             pass  # ignorar bloqueio de DMs
 
@@ -1,13 +1,22 @@
 # cogs/logs.py
 from __future__ import annotations
+import asyncio
 import datetime as dt
-from collections import deque
-from typing import Optional, List, Dict, Deque
+import json
+import logging
+import os
+import time
+from collections import Counter, OrderedDict, deque
+from typing import Optional, List, Dict, Deque, Tuple
 
 import discord
 from discord.ext import commands
 
 from utils import env
+from utils import ratelimit
+from utils.ratelimit import limiter
+
+log = logging.getLogger("logs")
 
 # ========= Helpers de ENV =========
 def _bool_env(name: str, default: bool) -> bool:
@@ -37,9 +46,33 @@ LOG_CHANNEL_ID: int = env.get_int("LOG_BOT_CHANNEL_ID", 0)
 IGNORE_CHANNELS: set[int] = set(_split_ids(env.get("LOG_IGNORE_CHANNELS", "")))
 IGNORE_BOTS: bool = _bool_env("LOG_IGNORE_BOTS", True)
 IGNORE_WEBHOOKS: bool = _bool_env("LOG_IGNORE_WEBHOOKS", True)
+# categorias inteiras ignoradas, tags no tópico que marcam canais ignorados (ex.: "opener:" = tickets)
+# e tipos de evento desligados (chaves de _KIND_LABELS: voice, message_edit, ...)
+IGNORE_CATEGORIES: set[int] = set(_split_ids(env.get("LOG_IGNORE_CATEGORIES", "")))
+IGNORE_TOPIC_TAGS: tuple[str, ...] = tuple(
+    t.strip() for t in str(env.get("LOG_IGNORE_TOPIC_TAGS", "") or "").split(",") if t.strip()
+)
+DISABLED_EVENTS: frozenset[str] = frozenset(
+    t.strip().lower() for t in str(env.get("LOG_DISABLED_EVENTS", "") or "").split(",") if t.strip()
+)
 RATE_MAX_PER_MIN: int = env.get_int("LOG_RATE_MAX_PER_MINUTE", 40)
 RATE_WINDOW_SECONDS: int = env.get_int("LOG_RATE_WINDOW_SECONDS", 60)
+# mesma cota de antes (N mensagens por janela), agora como bucket no limitador compartilhado
+limiter.configure("log", max(1, RATE_MAX_PER_MIN) / max(1, RATE_WINDOW_SECONDS), RATE_MAX_PER_MIN, charge_global=False)
+# janela de agrupamento dos eventos de voz por membro (mute/deaf/stream/vídeo/canal viram um só log)
 VOICE_COOLDOWN_MS: int = env.get_int("LOG_VOICE_COOLDOWN_MS", 1200)
+# eventos da mesma guild são agrupados por esta janela e saem juntos numa só mensagem
+BATCH_WINDOW_MS: int = env.get_int("LOG_BATCH_WINDOW_MS", 1500)
+
+# excedente: até LOG_QUEUE_MAX embeds em memória por guild, o resto vai para disco (JSONL);
+# backlog em disco acima de LOG_DIGEST_THRESHOLD vira um resumo em vez de ser reenviado um a um
+QUEUE_MAX: int = max(10, env.get_int("LOG_QUEUE_MAX", 200))
+DIGEST_THRESHOLD: int = env.get_int("LOG_DIGEST_THRESHOLD", 300)
+SPILL_DIR: str = os.path.join(env.data_dir(), "log_overflow")
+
+# limites do Discord por mensagem
+MAX_EMBEDS_PER_MESSAGE = 10
+MAX_CHARS_PER_MESSAGE = 6000
 
 FOOTER_NOME: str = env.footer_nome()
 FOOTER_LOGO: str = env.footer_logo()
@@ -64,127 +97,590 @@ def _set_brand(embed: discord.Embed) -> discord.Embed:
     return embed
 
 def _is_ignored_channel(ch: Optional[discord.abc.GuildChannel]) -> bool:
+    """Regra por canal (lista, categoria, tag no tópico) — usada para montar o filtro da guild."""
     if not ch:
         return False
-    return int(getattr(ch, "id", 0) or 0) in IGNORE_CHANNELS
-
-# ========= Rate Limiter =========
-class _RateLimiter:
-    def __init__(self, max_events: int, window_seconds: int):
-        self.max_events = max_events
-        self.window = dt.timedelta(seconds=window_seconds)
-        self._hits: Deque[dt.datetime] = deque()
-
-    def allow(self) -> bool:
-        now = dt.datetime.utcnow()
-        # limpa fora da janela
-        while self._hits and (now - self._hits[0]) > self.window:
-            self._hits.popleft()
-        if len(self._hits) >= self.max_events:
-            return False
-        self._hits.append(now)
+    if int(getattr(ch, "id", 0) or 0) in IGNORE_CHANNELS:
+        return True
+    if getattr(ch, "category_id", None) in IGNORE_CATEGORIES:
         return True
+    topic = getattr(ch, "topic", None) or ""
+    return bool(topic) and any(tag in topic for tag in IGNORE_TOPIC_TAGS)
+
+# ========= Excedente em disco =========
+class _OverflowSpill:
+    """Fila append-only em JSONL para o excedente de uma guild (sobrevive a restart).
+    append() só acumula na memória; o disco é tocado em lotes, no executor, pelo flusher."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0     # registros pendentes: no disco (não lidos) + no buffer
+        self._offset = 0   # bytes já reenviados
+        self._buffer: List[str] = []
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    async def _io(fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+    async def open(self):
+        """Recupera o arquivo deixado por um restart (conta os registros pendentes)."""
+        async with self._lock:
+            self.count += await self._io(self._recover)
+
+    def _recover(self) -> int:
+        if not os.path.exists(self.path):
+            return 0
+        with open(self.path, "r+b") as f:
+            data = f.read()
+            # linha final sem "\n" = escrita interrompida (crash): descarta o fragmento
+            # para o próximo append não grudar nele
+            end = data.rfind(b"\n") + 1
+            if end < len(data):
+                log.warning(f"⚠️ Fragmento corrompido no fim de {self.path} descartado ({len(data) - end} bytes)")
+                f.truncate(end)
+            return data.count(b"\n", 0, end)
+
+    def append(self, record: Dict):
+        self._buffer.append(json.dumps(record, ensure_ascii=False) + "\n")
+        self.count += 1
+
+    async def flush(self):
+        """Grava o buffer no disco de uma vez."""
+        async with self._lock:
+            await self._flush()
+
+    async def _flush(self):
+        if not self._buffer:
+            return
+        lines, self._buffer = self._buffer, []
+        try:
+            await self._io(self._write, lines)
+        except OSError as e:
+            self._buffer[:0] = lines  # fica na memória; tenta de novo no próximo lote
+            log.warning(f"⚠️ Falha ao gravar excedente em {self.path}: {e}")
+
+    def _write(self, lines: List[str]):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.writelines(lines)
+
+    async def pop(self, limit: Optional[int] = None) -> List[Dict]:
+        """Lê (e consome) os próximos `limit` registros, na ordem em que entraram."""
+        if not self.count:
+            return []
+        async with self._lock:
+            await self._flush()  # o buffer é mais novo que o disco: vai para o fim do arquivo
+            out, consumed, eof = await self._io(self._read, limit)
+            if eof:
+                # arquivo acabou (ou sumiu): o contador não pode ficar preso acima de zero
+                self.count = len(self._buffer)
+            else:
+                self.count = max(0, self.count - consumed)
+        return out
+
+    def _read(self, limit: Optional[int]) -> Tuple[List[Dict], int, bool]:
+        out: List[Dict] = []
+        consumed = 0
+        eof = False
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(self._offset)
+                while limit is None or len(out) < limit:
+                    line = f.readline()
+                    if not line:
+                        eof = True
+                        break
+                    # toda linha lida conta como consumida, válida ou não
+                    self._offset += len(line)
+                    consumed += 1
+                    try:
+                        out.append(json.loads(line))
+                    except ValueError:
+                        log.warning(f"⚠️ Registro inválido em {self.path} ignorado")
+                else:
+                    eof = not f.read(1)
+        except OSError:
+            eof = True
+        if eof:
+            self._remove()
+        return out, consumed, eof
+
+    def _remove(self):
+        self._offset = 0
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    async def clear(self):
+        async with self._lock:
+            self._buffer = []
+            self.count = 0
+            await self._io(self._remove)
+
+
+# ========= Debounce de voz =========
+_VOICE_FLAGS = (
+    ("self_mute", "🎙️ Self Mute"),
+    ("mute", "🔇 Server Mute"),
+    ("self_deaf", "🎧 Self Deaf"),
+    ("deaf", "🛑 Server Deaf"),
+    ("self_stream", "📵 Stream"),
+    ("self_video", "🎥 Video"),
+)
+_VOICE_MAX_MOVES = 8
+
+
+class _VoiceBurst:
+    """Eventos de voz de um membro dentro da janela: estado inicial/final de cada flag
+    + quantas vezes mudou, e as movimentações de canal em ordem."""
+
+    __slots__ = ("guild_id", "member", "deadline", "start", "end", "flips", "moves", "extra_moves", "channel_id")
+
+    def __init__(self, member: discord.Member, before: discord.VoiceState, deadline: float):
+        self.guild_id = member.guild.id
+        self.member = member
+        self.deadline = deadline
+        self.start: Dict[str, Optional[bool]] = {attr: getattr(before, attr, None) for attr, _ in _VOICE_FLAGS}
+        self.end = dict(self.start)
+        self.flips: Counter = Counter()
+        self.moves: List[str] = []
+        self.extra_moves = 0
+        self.channel_id = 0
+
+    def merge(self, member: discord.Member, before: discord.VoiceState, after: discord.VoiceState, moves: List[str]):
+        self.member = member
+        for attr, _ in _VOICE_FLAGS:
+            old, new = getattr(before, attr, None), getattr(after, attr, None)
+            if old is None or new is None or old == new:
+                continue
+            if self.start[attr] is None:
+                self.start[attr] = old
+            self.end[attr] = new
+            self.flips[attr] += 1
+        for line in moves:
+            if len(self.moves) < _VOICE_MAX_MOVES:
+                self.moves.append(line)
+            else:
+                self.extra_moves += 1
+        self.channel_id = getattr(after.channel or before.channel, "id", 0) or self.channel_id
+
+    def lines(self) -> List[str]:
+        out = list(self.moves)
+        if self.extra_moves:
+            out.append(f"… +{self.extra_moves} movimentações")
+        for attr, label in _VOICE_FLAGS:
+            n = self.flips[attr]
+            if not n:
+                continue
+            txt = f"{label}: {'ON' if self.end[attr] else 'OFF'}"
+            if self.start[attr] == self.end[attr]:
+                txt += " (alternou e voltou)"
+            if n > 1:
+                txt += f" ×{n}"
+            out.append(txt)
+        return out
+
+
+class _VoiceDebounce:
+    """Rajadas por (guild, membro). O 1º evento abre uma janela fixa de VOICE_COOLDOWN_MS e os
+    seguintes são mesclados nela; ao expirar sai um único log resumido e a entrada some.
+    Com janela fixa, a ordem de inserção do OrderedDict já é a ordem dos prazos: expirar é
+    só olhar o início (O(1)), e o tamanho fica limitado aos membros ativos na última janela."""
+
+    def __init__(self, cooldown_ms: int):
+        self.cooldown = max(0, cooldown_ms) / 1000
+        self._bursts: "OrderedDict[Tuple[int, int], _VoiceBurst]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._bursts)
+
+    def add(self, member: discord.Member, before: discord.VoiceState, after: discord.VoiceState, moves: List[str]):
+        key = (member.guild.id, member.id)
+        burst = self._bursts.get(key)
+        if burst is None:
+            burst = self._bursts[key] = _VoiceBurst(member, before, time.monotonic() + self.cooldown)
+        burst.merge(member, before, after, moves)
+
+    def next_deadline(self) -> Optional[float]:
+        for burst in self._bursts.values():
+            return burst.deadline
+        return None
+
+    def pop_expired(self, now: float) -> List[_VoiceBurst]:
+        out: List[_VoiceBurst] = []
+        while self._bursts:
+            key, burst = next(iter(self._bursts.items()))
+            if burst.deadline > now:
+                break
+            del self._bursts[key]
+            out.append(burst)
+        return out
+
+    def drain(self) -> List[_VoiceBurst]:
+        out = list(self._bursts.values())
+        self._bursts.clear()
+        return out
+
+
+_KIND_LABELS = {
+    "message_delete": "mensagens apagadas",
+    "message_edit": "mensagens editadas",
+    "bulk_delete": "limpezas em massa",
+    "voice": "eventos de voz",
+    "member_update": "atualizações de membro",
+    "member_join": "entradas",
+    "member_remove": "saídas",
+    "channel_create": "canais criados",
+    "channel_delete": "canais deletados",
+    "channel_update": "canais atualizados",
+    "thread_create": "threads criadas",
+    "thread_delete": "threads deletadas",
+}
+
+def _digest_embeds(records: List[Dict]) -> List[discord.Embed]:
+    """Resume o backlog: contagem por tipo/canal + autores mais frequentes."""
+    groups: Dict[Tuple[str, int], Counter] = {}
+    totals: Counter = Counter()
+    for r in records:
+        key = (r.get("kind") or "", int(r.get("channel_id") or 0))
+        totals[key] += 1
+        authors = groups.setdefault(key, Counter())
+        if r.get("author_id"):
+            authors[int(r["author_id"])] += 1
+
+    first = min((r.get("ts") or time.time()) for r in records)
+    minutes = max(1, round((time.time() - first) / 60))
+    lines = [f"Backlog de **{len(records)}** eventos nos últimos {minutes} min (resumido por causa do rate limit)."]
+    for (kind, channel_id), n in totals.most_common():
+        line = f"• **{n}** {_KIND_LABELS.get(kind, 'outros eventos')}"
+        if channel_id:
+            line += f" em <#{channel_id}>"
+        top = groups[(kind, channel_id)].most_common(3)
+        if top:
+            line += " — top autores: " + ", ".join(f"<@{a}> ({c})" for a, c in top)
+        lines.append(line)
+
+    embeds: List[discord.Embed] = []
+    chunk = ""
+    for line in lines:
+        if len(chunk) + len(line) + 1 > 3900:
+            embeds.append(discord.Embed(title="📊 Resumo de logs", description=chunk, color=discord.Color.dark_gold()))
+            chunk = ""
+        chunk += line + "\n"
+    if chunk:
+        embeds.append(discord.Embed(title="📊 Resumo de logs", description=chunk, color=discord.Color.dark_gold()))
+    for emb in embeds:
+        _set_brand(emb)
+        emb.timestamp = dt.datetime.utcnow()
+    return embeds
+
+# ========= Filtro por guild =========
+class _GuildFilter:
+    """Tudo que decide "logar este evento?" numa guild, resolvido uma vez: canal de log,
+    IDs ignorados já expandidos (lista + categorias + tags de tópico). Reconstruído quando
+    canais mudam; cada evento custa só consultas em set."""
+
+    __slots__ = ("log_channel", "ignored")
+
+    def __init__(self, guild: discord.Guild):
+        ch = guild.get_channel(LOG_CHANNEL_ID) if LOG_CHANNEL_ID else None
+        self.log_channel: Optional[discord.TextChannel] = ch if isinstance(ch, discord.TextChannel) else None
+        self.ignored: set[int] = set(IGNORE_CHANNELS) | IGNORE_CATEGORIES
+        self.ignored.update(c.id for c in guild.channels if _is_ignored_channel(c))
+
+    def refresh(self, ch: discord.abc.GuildChannel):
+        """Recalcula só o canal criado/alterado (e o canal de log, se for ele)."""
+        if _is_ignored_channel(ch):
+            self.ignored.add(ch.id)
+        else:
+            self.ignored.discard(ch.id)
+        if ch.id == LOG_CHANNEL_ID:
+            self.log_channel = ch if isinstance(ch, discord.TextChannel) else None
+
+    def drop(self, ch: discord.abc.GuildChannel):
+        if ch.id not in IGNORE_CHANNELS and ch.id not in IGNORE_CATEGORIES:
+            self.ignored.discard(ch.id)
+        if ch.id == LOG_CHANNEL_ID:
+            self.log_channel = None
+
+    def channel_ignored(self, ch) -> bool:
+        if ch is None:
+            return False
+        # threads herdam do canal pai
+        return ch.id in self.ignored or getattr(ch, "parent_id", None) in self.ignored
+
+    def allows(self, kind: str, *channels, author=None, webhook_id=None) -> bool:
+        if self.log_channel is None or kind in DISABLED_EVENTS:
+            return False
+        if IGNORE_BOTS and getattr(author, "bot", False):
+            return False
+        if IGNORE_WEBHOOKS and webhook_id:
+            return False
+        return not any(self.channel_ignored(ch) for ch in channels)
+
 
 # ========= Cog =========
 class LogsCog(commands.Cog):
-    """Logs de voz, mensagens, membros, canais e threads, com rate-limit e filtros."""
+    """Logs de voz, mensagens, membros, canais e threads, com rate-limit e filtros.
+    Os eventos são agrupados por guild (até 10 embeds / 6000 caracteres por mensagem)."""
 
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self._limiters: Dict[int, _RateLimiter] = {}
-        self._last_voice_event_at: Dict[tuple[int, int], dt.datetime] = {}
+        self._voice = _VoiceDebounce(VOICE_COOLDOWN_MS)
+        self._voice_task: Optional[asyncio.Task] = None
+        self._pending: Dict[int, Deque[discord.Embed]] = {}
+        self._wakeups: Dict[int, asyncio.Event] = {}
+        self._flushers: Dict[int, asyncio.Task] = {}
+        self._spills: Dict[int, _OverflowSpill] = {}
+        self._filters: Dict[int, _GuildFilter] = {}
+        unknown = DISABLED_EVENTS - _KIND_LABELS.keys()
+        if unknown:
+            log.warning(f"⚠️ LOG_DISABLED_EVENTS com tipos desconhecidos: {', '.join(sorted(unknown))}")
+
+    def _spill_for(self, guild_id: int) -> _OverflowSpill:
+        spill = self._spills.get(guild_id)
+        if spill is None:
+            spill = self._spills[guild_id] = _OverflowSpill(os.path.join(SPILL_DIR, f"{guild_id}.jsonl"))
+        return spill
+
+    async def cog_load(self):
+        # excedente gravado antes de um restart: carregado antes dos listeners (mantém a ordem)
+        # e drenado quando o bot conectar
+        names = await asyncio.get_running_loop().run_in_executor(
+            None, lambda: os.listdir(SPILL_DIR) if os.path.isdir(SPILL_DIR) else []
+        )
+        for name in names:
+            if name.endswith(".jsonl") and name[:-6].isdigit():
+                await self._spill_for(int(name[:-6])).open()
+        if self._spills:
+            self.bot.loop.create_task(self._resume_spills())
+
+    async def _resume_spills(self):
+        await self.bot.wait_until_ready()
+        for guild_id, spill in list(self._spills.items()):
+            guild = self.bot.get_guild(guild_id)
+            if guild and spill.count:
+                log.warning(f"♻️ Retomando {spill.count} logs pendentes em disco ({guild.name})")
+                self._ensure_flusher(guild)
+
+    def _filter_for(self, guild: discord.Guild) -> _GuildFilter:
+        flt = self._filters.get(guild.id)
+        if flt is None:
+            flt = self._filters[guild.id] = _GuildFilter(guild)
+        return flt
+
+    def _should_log(self, guild: Optional[discord.Guild], kind: str, *channels, author=None, webhook_id=None) -> bool:
+        """Uma consulta ao filtro compilado da guild em vez dos checks repetidos em cada listener."""
+        if not isinstance(guild, discord.Guild):
+            return False
+        return self._filter_for(guild).allows(kind, *channels, author=author, webhook_id=webhook_id)
 
     def _log_channel(self, guild: Optional[discord.Guild]) -> Optional[discord.TextChannel]:
         if not guild or not LOG_CHANNEL_ID:
             return None
-        ch = guild.get_channel(LOG_CHANNEL_ID)
-        return ch if isinstance(ch, discord.TextChannel) else None
-
-    def _limiter_for(self, guild_id: int) -> _RateLimiter:
-        lim = self._limiters.get(guild_id)
-        if not lim or lim.max_events != RATE_MAX_PER_MIN or lim.window != dt.timedelta(seconds=RATE_WINDOW_SECONDS):
-            lim = _RateLimiter(RATE_MAX_PER_MIN, RATE_WINDOW_SECONDS)
-            self._limiters[guild_id] = lim
-        return lim
-
-    async def _send_log(self, guild: Optional[discord.Guild], embed: discord.Embed):
+        return self._filter_for(guild).log_channel
+
+
+    async def _send_log(
+        self,
+        guild: Optional[discord.Guild],
+        embed: discord.Embed,
+        *,
+        kind: str = "",
+        channel_id: int = 0,
+        author_id: int = 0,
+    ):
+        """Enfileira o embed; o flusher da guild envia em lotes (não bloqueia o listener).
+        Fila cheia → disco; `kind`/`channel_id`/`author_id` alimentam o resumo do backlog."""
         ch = self._log_channel(guild)
         if not ch or not guild:
             return
-        if not self._limiter_for(guild.id).allow():
-            return
-        try:
-            await ch.send(embed=embed)
-        except Exception:
-            pass
+        q = self._pending.setdefault(guild.id, deque())
+        spill = self._spill_for(guild.id)
+        if spill.count or len(q) >= QUEUE_MAX:
+            # depois que algo foi para o disco, tudo vai para o disco (mantém a ordem)
+            spill.append({
+                "ts": time.time(),
+                "kind": kind,
+                "channel_id": channel_id,
+                "author_id": author_id,
+                "embed": embed.to_dict(),
+            })
+        else:
+            q.append(embed)
+        wake = self._wakeups.setdefault(guild.id, asyncio.Event())
+        if self._batch_full(q):
+            wake.set()
+        self._ensure_flusher(guild)
+
+    def _ensure_flusher(self, guild: discord.Guild):
+        self._pending.setdefault(guild.id, deque())
+        self._wakeups.setdefault(guild.id, asyncio.Event())
+        task = self._flushers.get(guild.id)
+        if task is None or task.done():
+            self._flushers[guild.id] = asyncio.create_task(self._flush_loop(guild))
+
+    async def _refill(self, guild_id: int):
+        """Traz o excedente do disco para a memória — ou um resumo, se o backlog passou do limite."""
+        q = self._pending[guild_id]
+        spill = self._spill_for(guild_id)
+        if spill.count > DIGEST_THRESHOLD:
+            records = await spill.pop()
+            log.warning(f"📊 Backlog de {len(records)} logs na guild {guild_id} resumido em digest")
+            q.extend(_digest_embeds(records))
+        elif spill.count and len(q) < QUEUE_MAX:
+            for r in await spill.pop(QUEUE_MAX - len(q)):
+                try:
+                    q.append(discord.Embed.from_dict(r["embed"]))
+                except Exception:
+                    pass
+
+    # ========== LOTES ==========
+    @staticmethod
+    def _batch_full(q: Deque[discord.Embed]) -> bool:
+        if len(q) >= MAX_EMBEDS_PER_MESSAGE:
+            return True
+        return sum(len(e) for e in q) >= MAX_CHARS_PER_MESSAGE
+
+    @staticmethod
+    def _take_batch(q: Deque[discord.Embed]) -> List[discord.Embed]:
+        batch: List[discord.Embed] = []
+        chars = 0
+        while q and len(batch) < MAX_EMBEDS_PER_MESSAGE:
+            size = len(q[0])
+            if batch and chars + size > MAX_CHARS_PER_MESSAGE:
+                break
+            batch.append(q.popleft())
+            chars += size
+        return batch
+
+    async def _flush_loop(self, guild: discord.Guild):
+        """Espera o lote encher ou a janela passar; o rate-limit agora conta mensagens,
+        e quando estoura o lote espera a vaga em vez de ser descartado."""
+        q = self._pending[guild.id]
+        wake = self._wakeups[guild.id]
+        spill = self._spill_for(guild.id)
+        while q or spill.count:
+            await spill.flush()  # o excedente acumulado desde o último lote vai para o disco de uma vez
+            await self._refill(guild.id)
+            if not q:
+                # nada aproveitável nesta leva (registros inválidos): devolve o loop antes de tentar de novo
+                await asyncio.sleep(0)
+                continue
+            if not self._batch_full(q):
+                try:
+                    await asyncio.wait_for(wake.wait(), timeout=BATCH_WINDOW_MS / 1000)
+                except asyncio.TimeoutError:
+                    pass
+            wake.clear()
+
+            ch = self._log_channel(guild)
+            if ch is None:
+                q.clear()
+                await spill.clear()
+                break
+            # limite de logs por guild (LOG_RATE_*): espera a vaga, o lote não se perde
+            await limiter.acquire("log", guild.id)
+            try:
+                await ratelimit.send(ch, embeds=self._take_batch(q))
+            except Exception:
+                pass
+
+    async def cog_unload(self):
+        # rajadas de voz ainda abertas entram na fila antes do flush final
+        if self._voice_task:
+            self._voice_task.cancel()
+        for burst in self._voice.drain():
+            await self._emit_voice(burst)
+        for task in self._flushers.values():
+            task.cancel()
+        # excedente ainda na memória vai para o disco (drenado no próximo start)
+        for spill in self._spills.values():
+            await spill.flush()
+        # melhor esforço: o que ficou na memória sai agora; o que está em disco espera o próximo start
+        for guild_id, q in self._pending.items():
+            ch = self._log_channel(self.bot.get_guild(guild_id))
+            while q and ch:
+                try:
+                    await ratelimit.send(ch, embeds=self._take_batch(q))
+                except Exception:
+                    break
+
+    # ========== FILTRO ==========
+    @commands.Cog.listener()
+    async def on_guild_available(self, guild: discord.Guild):
+        # cache da guild recriado (reconexão): o filtro é remontado na próxima consulta
+        self._filters.pop(guild.id, None)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild: discord.Guild):
+        self._filters.pop(guild.id, None)
 
     # ========== VOICE ==========
     @commands.Cog.listener()
     async def on_voice_state_update(self, member: discord.Member, before: discord.VoiceState, after: discord.VoiceState):
         guild = member.guild
-        if not self._log_channel(guild):
-            return
-        if IGNORE_BOTS and member.bot:
+        if not self._should_log(guild, "voice", author=member):
             return
 
-        changes: List[str] = []
+        moves: List[str] = []
         if before.channel != after.channel:
-            if _is_ignored_channel(before.channel) or _is_ignored_channel(after.channel):
+            if not self._should_log(guild, "voice", before.channel, after.channel):
                 return
             if before.channel is None and after.channel:
-                changes.append(f"🎧 **Entrou** em {after.channel.mention}")
+                moves.append(f"🎧 **Entrou** em {after.channel.mention}")
             elif before.channel and after.channel is None:
-                changes.append(f"👋 **Saiu** de {before.channel.mention}")
+                moves.append(f"👋 **Saiu** de {before.channel.mention}")
             elif before.channel and after.channel:
-                changes.append(f"🔁 **Moveu** {before.channel.mention} → {after.channel.mention}")
-
-        def flag(txt: str, old: Optional[bool], new: Optional[bool]):
-            if old is None or new is None or old == new:
-                return None
-            return f"{txt}: {'ON' if new else 'OFF'}"
-
-        fchanges = [
-            flag("🎙️ Self Mute", before.self_mute, after.self_mute),
-            flag("🔇 Server Mute", before.mute, after.mute),
-            flag("🎧 Self Deaf", before.self_deaf, after.self_deaf),
-            flag("🛑 Server Deaf", before.deaf, after.deaf),
-            flag("📵 Stream", before.self_stream, after.self_stream),
-            flag("🎥 Video", before.self_video, after.self_video),
-        ]
-        changes += [c for c in fchanges if c]
-
-        if not changes:
+                moves.append(f"🔁 **Moveu** {before.channel.mention} → {after.channel.mention}")
+
+        if not moves and not any(
+            getattr(before, attr, None) is not None
+            and getattr(after, attr, None) is not None
+            and getattr(before, attr) != getattr(after, attr)
+            for attr, _ in _VOICE_FLAGS
+        ):
             return
 
-        # Debounce por usuário
-        key = (guild.id, member.id)
-        now = dt.datetime.utcnow()
-        last = self._last_voice_event_at.get(key)
-        if last and (now - last).total_seconds() * 1000.0 < VOICE_COOLDOWN_MS:
+        # Debounce por usuário: mescla a rajada e sai um log só quando a janela fecha
+        self._voice.add(member, before, after, moves)
+        if self._voice_task is None or self._voice_task.done():
+            self._voice_task = asyncio.create_task(self._voice_loop())
+
+    async def _voice_loop(self):
+        while True:
+            for burst in self._voice.pop_expired(time.monotonic()):
+                await self._emit_voice(burst)
+            deadline = self._voice.next_deadline()
+            if deadline is None:
+                break
+            await asyncio.sleep(max(0.0, deadline - time.monotonic()))
+
+    async def _emit_voice(self, burst: _VoiceBurst):
+        changes = burst.lines()
+        guild = self.bot.get_guild(burst.guild_id)
+        if not changes or not guild:
             return
-        self._last_voice_event_at[key] = now
-
         embed = discord.Embed(
             title="🔔 Log de Voz",
             description="\n".join(changes),
             color=discord.Color.blurple()
         )
         _set_brand(embed)
-        embed.add_field(name="👤 Usuário", value=f"{member.mention} (`{member.id}`)", inline=False)
+        embed.add_field(name="👤 Usuário", value=f"{burst.member.mention} (`{burst.member.id}`)", inline=False)
         embed.timestamp = dt.datetime.utcnow()
-        await self._send_log(guild, embed)
+        await self._send_log(guild, embed, kind="voice", channel_id=burst.channel_id, author_id=burst.member.id)
 
     # ========== MENSAGENS ==========
     @commands.Cog.listener()
     async def on_message_delete(self, message: discord.Message):
         guild = message.guild
-        if not guild or not self._log_channel(guild):
-            return
-        if IGNORE_BOTS and getattr(message.author, "bot", False):
-            return
-        if IGNORE_WEBHOOKS and getattr(message, "webhook_id", None):
-            return
-        if _is_ignored_channel(getattr(message, "channel", None)):
+        if not self._should_log(
+            guild, "message_delete", getattr(message, "channel", None),
+            author=message.author, webhook_id=getattr(message, "webhook_id", None),
+        ):
             return
 
         content = message.content if message.content else ""
@@ -207,7 +703,10 @@ class LogsCog(commands.Cog):
         if message.created_at:
             embed.set_footer(text=f"{FOOTER_NOME} • Criada: {_fmt_dt_utc(message.created_at)}", icon_url=FOOTER_LOGO or None)
         embed.timestamp = dt.datetime.utcnow()
-        await self._send_log(guild, embed)
+        await self._send_log(
+            guild, embed, kind="message_delete",
+            channel_id=getattr(message.channel, "id", 0), author_id=getattr(message.author, "id", 0),
+        )
 
     @commands.Cog.listener()
     async def on_bulk_message_delete(self, messages: List[discord.Message]):
@@ -215,9 +714,7 @@ class LogsCog(commands.Cog):
             return
         guild = messages[0].guild
         channel = messages[0].channel if messages else None
-        if not guild or not self._log_channel(guild):
-            return
-        if _is_ignored_channel(channel):
+        if not self._should_log(guild, "bulk_delete", channel):
             return
         embed = discord.Embed(
             title="🧹 Mensagens Apagadas em Massa",
@@ -226,18 +723,15 @@ class LogsCog(commands.Cog):
         )
         _set_brand(embed)
         embed.timestamp = dt.datetime.utcnow()
-        await self._send_log(guild, embed)
+        await self._send_log(guild, embed, kind="bulk_delete", channel_id=getattr(channel, "id", 0))
 
     @commands.Cog.listener()
     async def on_message_edit(self, before: discord.Message, after: discord.Message):
         guild = before.guild
-        if not guild or not self._log_channel(guild):
-            return
-        if IGNORE_BOTS and getattr(before.author, "bot", False):
-            return
-        if IGNORE_WEBHOOKS and getattr(before, "webhook_id", None):
-            return
-        if _is_ignored_channel(getattr(before, "channel", None)):
+        if not self._should_log(
+            guild, "message_edit", getattr(before, "channel", None),
+            author=before.author, webhook_id=getattr(before, "webhook_id", None),
+        ):
             return
         if (before.content or "") == (after.content or ""):
             return
@@ -258,15 +752,16 @@ class LogsCog(commands.Cog):
         except Exception:
             pass
         embed.timestamp = dt.datetime.utcnow()
-        await self._send_log(guild, embed)
+        await self._send_log(
+            guild, embed, kind="message_edit",
+            channel_id=getattr(before.channel, "id", 0), author_id=getattr(before.author, "id", 0),
+        )
 
     # ========== MEMBROS ==========
     @commands.Cog.listener()
     async def on_member_update(self, before: discord.Member, after: discord.Member):
         guild = after.guild
-        if not self._log_channel(guild):
-            return
-        if IGNORE_BOTS and after.bot:
+        if not self._should_log(guild, "member_update", author=after):
             return
 
         diffs: List[str] = []
@@ -293,14 +788,12 @@ class LogsCog(commands.Cog):
         _set_brand(embed)
         embed.add_field(name="Usuário", value=f"{after.mention} (`{after.id}`)", inline=False)
         embed.timestamp = dt.datetime.utcnow()
-        await self._send_log(guild, embed)
+        await self._send_log(guild, embed, kind="member_update", author_id=after.id)
 
     @commands.Cog.listener()
     async def on_member_join(self, member: discord.Member):
         guild = member.guild
-        if not self._log_channel(guild):
-            return
-        if IGNORE_BOTS and member.bot:
+        if not self._should_log(guild, "member_join", author=member):
             return
         embed = discord.Embed(
             title="✅ Membro Entrou",
@@ -314,14 +807,12 @@ class LogsCog(commands.Cog):
             pass
         embed.add_field(name="Conta criada", value=_fmt_dt_utc(member.created_at), inline=True)
         embed.timestamp = dt.datetime.utcnow()
-        await self._send_log(guild, embed)
+        await self._send_log(guild, embed, kind="member_join", author_id=member.id)
 
     @commands.Cog.listener()
     async def on_member_remove(self, member: discord.Member):
         guild = member.guild
-        if not self._log_channel(guild):
-            return
-        if IGNORE_BOTS and getattr(member, "bot", False):
+        if not self._should_log(guild, "member_remove", author=member):
             return
         embed = discord.Embed(
             title="🚪 Membro Saiu",
@@ -334,13 +825,15 @@ class LogsCog(commands.Cog):
         except Exception:
             pass
         embed.timestamp = dt.datetime.utcnow()
-        await self._send_log(guild, embed)
+        await self._send_log(guild, embed, kind="member_remove", author_id=getattr(member, "id", 0))
 
     # ========== CANAIS ==========
     @commands.Cog.listener()
     async def on_guild_channel_create(self, channel: discord.abc.GuildChannel):
         guild = getattr(channel, "guild", None)
-        if not isinstance(guild, discord.Guild) or not self._log_channel(guild) or _is_ignored_channel(channel):
+        if isinstance(guild, discord.Guild) and guild.id in self._filters:
+            self._filters[guild.id].refresh(channel)
+        if not self._should_log(guild, "channel_create", channel):
             return
         ref = getattr(channel, "mention", None) or f"`{getattr(channel, 'name', '?')}`"
         embed = discord.Embed(
@@ -350,12 +843,15 @@ class LogsCog(commands.Cog):
         )
         _set_brand(embed)
         embed.timestamp = dt.datetime.utcnow()
-        await self._send_log(guild, embed)
+        await self._send_log(guild, embed, kind="channel_create", channel_id=getattr(channel, "id", 0))
 
     @commands.Cog.listener()
     async def on_guild_channel_delete(self, channel: discord.abc.GuildChannel):
         guild = getattr(channel, "guild", None)
-        if not isinstance(guild, discord.Guild) or not self._log_channel(guild) or _is_ignored_channel(channel):
+        allowed = self._should_log(guild, "channel_delete", channel)
+        if isinstance(guild, discord.Guild) and guild.id in self._filters:
+            self._filters[guild.id].drop(channel)
+        if not allowed:
             return
         embed = discord.Embed(
             title="🗑️ Canal Deletado",
@@ -364,12 +860,14 @@ class LogsCog(commands.Cog):
         )
         _set_brand(embed)
         embed.timestamp = dt.datetime.utcnow()
-        await self._send_log(guild, embed)
+        await self._send_log(guild, embed, kind="channel_delete")
 
     @commands.Cog.listener()
     async def on_guild_channel_update(self, before: discord.abc.GuildChannel, after: discord.abc.GuildChannel):
         guild = getattr(after, "guild", None)
-        if not isinstance(guild, discord.Guild) or not self._log_channel(guild) or _is_ignored_channel(after):
+        if isinstance(guild, discord.Guild) and guild.id in self._filters:
+            self._filters[guild.id].refresh(after)
+        if not self._should_log(guild, "channel_update", after):
             return
         diffs: List[str] = []
         if getattr(before, "name", None) != getattr(after, "name", None):
@@ -392,13 +890,13 @@ class LogsCog(commands.Cog):
         _set_brand(embed)
         embed.add_field(name="Canal", value=getattr(after, "mention", f"`{after.name}`"), inline=False)
         embed.timestamp = dt.datetime.utcnow()
-        await self._send_log(guild, embed)
+        await self._send_log(guild, embed, kind="channel_update", channel_id=getattr(after, "id", 0))
 
     # ========== THREADS ==========
     @commands.Cog.listener()
     async def on_thread_create(self, thread: discord.Thread):
         guild = thread.guild
-        if not self._log_channel(guild) or _is_ignored_channel(thread.parent):
+        if not self._should_log(guild, "thread_create", thread):
             return
         embed = discord.Embed(
             title="🧵 Thread Criada",
@@ -407,12 +905,12 @@ class LogsCog(commands.Cog):
         )
         _set_brand(embed)
         embed.timestamp = dt.datetime.utcnow()
-        await self._send_log(guild, embed)
+        await self._send_log(guild, embed, kind="thread_create", channel_id=getattr(thread.parent, "id", 0))
 
     @commands.Cog.listener()
     async def on_thread_delete(self, thread: discord.Thread):
         guild = thread.guild
-        if not self._log_channel(guild) or _is_ignored_channel(thread.parent):
+        if not self._should_log(guild, "thread_delete", thread):
             return
         embed = discord.Embed(
             title="🧵 Thread Deletada",
@@ -421,7 +919,7 @@ class LogsCog(commands.Cog):
         )
         _set_brand(embed)
         embed.timestamp = dt.datetime.utcnow()
-        await self._send_log(guild, embed)
+        await self._send_log(guild, embed, kind="thread_delete", channel_id=getattr(thread.parent, "id", 0))
 
 async def setup(bot: commands.Bot):
     await bot.add_cog(LogsCog(bot))
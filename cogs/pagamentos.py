@@ -4,6 +4,7 @@ import discord
 from discord.ext import commands
 from discord import app_commands, Interaction
 from utils import env
+from utils import ratelimit
 
 log = logging.getLogger("pagamentos")
 
@@ -52,7 +53,7 @@ class Pagamentos(commands.Cog):
         if env.footer_logo():
             embed.set_thumbnail(url=env.footer_logo())
 
-        msg = await itx.channel.send(embed=embed)
+        msg = await ratelimit.send(itx.channel, embed=embed)
         await itx.followup.send(f"✅ **PIX publicado!** [Ver mensagem]({msg.jump_url})", ephemeral=True)
 
   
@@ -91,7 +92,7 @@ class Pagamentos(commands.Cog):
         if env.footer_logo():
             embed.set_thumbnail(url=env.footer_logo())
 
-        await found_msg.edit(embed=embed)
+        await ratelimit.call("channel", found_msg.channel.id, found_msg.edit, embed=embed)
         await itx.followup.send("✅ Mensagem de pagamento atualizada para *Pagamento Confirmado!*", ephemeral=True)
 
     # =========================================================
@@ -129,7 +130,7 @@ class Pagamentos(commands.Cog):
         embed.set_footer(text=env.footer_nome(), icon_url=env.footer_logo())
         if env.footer_logo():
             embed.set_thumbnail(url=env.footer_logo())
-        msg = await itx.channel.send(embed=embed)
+        msg = await ratelimit.send(itx.channel, embed=embed)
         await itx.followup.send(f"📦 **Tabela publicada!** [Ver mensagem]({msg.jump_url})", ephemeral=True)
 
     # =========================================================
@@ -158,7 +159,7 @@ class Pagamentos(commands.Cog):
         embed.set_footer(text=env.footer_nome(), icon_url=env.footer_logo())
         if env.footer_logo():
             embed.set_thumbnail(url=env.footer_logo())
-        msg = await itx.channel.send(embed=embed)
+        msg = await ratelimit.send(itx.channel, embed=embed)
         await itx.followup.send(f"🧵 **Instruções publicadas!** [Ver mensagem]({msg.jump_url})", ephemeral=True)
 
 
@@ -3,19 +3,34 @@ from __future__ import annotations
 import asyncio
 import datetime as dt
 import logging
-from typing import Optional, List, Dict
+from collections import OrderedDict, deque
+from typing import Optional, List, Dict, Deque
 
 import discord
 from discord.ext import commands
 from discord import app_commands
 
 from utils import env
-from cogs.transcript_html_core import generate_transcript_html
-from utils.ftp_uploader import upload_to_hostgator
-import aiohttp
+from utils import http_client
+from utils import ratelimit
+from utils.ratelimit import limiter
+from utils.close_journal import journal, CloseJob
+from utils.ticket_capture import capture
+from cogs.transcript_html_core import discord_mentions_to_text
+from cogs.transcript_formats import formats_for, format_label, is_auxiliary, needs_mirror
+from cogs.transcript_pipeline import (
+    DEFAULT_HEADER,
+    AttachmentMirror,
+    TranscriptMessage,
+    collect_history,
+    collect_message,
+    embed_data,
+    mirror_stage,
+    render_stage,
+    upload_stage,
+)
+import json
 import os
-from cogs.transcript_html_core import is_image  
-import re
 
 
 log = logging.getLogger("tickets")
@@ -30,7 +45,7 @@ async def _send_ticket_log(bot: commands.Bot, guild: discord.Guild, embed: disco
     # tenta usar canal de transcript
     if log_channel and isinstance(log_channel, discord.TextChannel):
         try:
-            await log_channel.send(embed=embed)
+            await ratelimit.send(log_channel, embed=embed)
             return
         except Exception:
             pass
@@ -43,7 +58,7 @@ async def _send_ticket_log(bot: commands.Bot, guild: discord.Guild, embed: disco
         log_channel_id = env.get_int("LOG_BOT_CHANNEL_ID", 0)
         ch = guild.get_channel(log_channel_id)
         if isinstance(ch, discord.TextChannel):
-            await ch.send(embed=embed)
+            await ratelimit.send(ch, embed=embed)
 
 
 # ================== ENV ==================
@@ -63,31 +78,6 @@ TRANSCRIPT_LOG_CHANNEL_ID: int = env.transcript_log_channel_id()  # ✅ canal de
 
 
 
-def discord_mentions_to_text(content: str, guild: discord.Guild) -> str:
-    """Converte <@id>, <@&id>, <#id> para @Nome, @Cargo, #canal."""
-    if not content:
-        return ""
-
-    def repl_user(m):
-        uid = int(m.group(1))
-        mem = guild.get_member(uid)
-        return f"@{mem.display_name}" if mem else f"@{uid}"
-
-    def repl_role(m):
-        rid = int(m.group(1))
-        role = guild.get_role(rid)
-        return f"@{role.name}" if role else f"@&{rid}"
-
-    def repl_chan(m):
-        cid = int(m.group(1))
-        ch = guild.get_channel(cid)
-        return f"#{ch.name}" if ch else f"#{cid}"
-
-    content = re.sub(r"<@!?(\d+)>", repl_user, content)
-    content = re.sub(r"<@&(\d+)>", repl_role, content)
-    content = re.sub(r"<#(\d+)>", repl_chan, content)
-    return content
-
 def _now_unix() -> int:
     # usa UTC; o Discord renderiza no fuso do usuário
     return int(dt.datetime.now(dt.timezone.utc).timestamp())
@@ -131,13 +121,11 @@ def _parse_member(guild: discord.Guild, raw: str) -> Optional[discord.Member]:
 async def _ephemeral_ok(itx: discord.Interaction, text: str):
     """Envia uma resposta ephemeral com fallback seguro."""
     try:
-        # Evita erro caso a interação tenha expirado
-        if (discord.utils.utcnow() - itx.created_at).total_seconds() > 3:
-            return  # interação velha, ignora silenciosamente
-
-        # Se a interação já foi respondida, usa followup
+        # Se a interação já foi respondida/deferida, usa followup (vale por 15 min)
         if itx.response.is_done():
             await itx.followup.send(text, ephemeral=True)
+        elif (discord.utils.utcnow() - itx.created_at).total_seconds() > 3:
+            return  # interação velha sem resposta: o token já expirou, ignora silenciosamente
         else:
             await itx.response.send_message(text, ephemeral=True)
 
@@ -204,7 +192,8 @@ class AssuntoModal(discord.ui.Modal, title="Abrir Ticket — Assunto"):
         assunto_txt = str(self.assunto.value).strip()
         topic = f"opener:{user.id}|categoria:{self.category_key}|assunto:{assunto_txt}"
         try:
-            ch = await guild.create_text_channel(
+            ch = await ratelimit.call(
+                "guild", guild.id, guild.create_text_channel,
                 name=ch_name, category=category, overwrites=overwrites, topic=topic
             )
         except Exception as e:
@@ -230,7 +219,7 @@ class AssuntoModal(discord.ui.Modal, title="Abrir Ticket — Assunto"):
 
         staff_ping = _admin_mentions(guild)
         content_ping = f"{user.mention} {staff_ping}".strip()
-        await ch.send(content=content_ping, embed=opened, view=view_controls)
+        await ratelimit.send(ch, content=content_ping, embed=opened, view=view_controls)
 
         # 2) Notificar equipe por DM
         try:
@@ -261,7 +250,7 @@ class AssuntoModal(discord.ui.Modal, title="Abrir Ticket — Assunto"):
                             url=ch.jump_url,
                             style=discord.ButtonStyle.link
                         ))
-                        await member.send(embed=dm_embed, view=view)
+                        await ratelimit.send(member, embed=dm_embed, view=view)
                     except Exception:
                         pass
         except Exception:
@@ -294,7 +283,7 @@ class AssuntoModal(discord.ui.Modal, title="Abrir Ticket — Assunto"):
 
 
         termos_view = TermsView(custom_id=f"terms:{ch.id}:{user.id}")
-        await ch.send(embed=termos, view=termos_view)
+        await ratelimit.send(ch, embed=termos, view=termos_view)
 
         # 4) DM do usuário
         try:
@@ -306,7 +295,7 @@ class AssuntoModal(discord.ui.Modal, title="Abrir Ticket — Assunto"):
             _brand(emb_dm)
             btn = discord.ui.View(timeout=120)
             btn.add_item(discord.ui.Button(label="Ir para o ticket", url=ch.jump_url, style=discord.ButtonStyle.link))
-            await user.send(embed=emb_dm, view=btn)
+            await ratelimit.send(user, embed=emb_dm, view=btn)
         except Exception:
             pass
 
@@ -430,7 +419,7 @@ class AcceptButton(discord.ui.Button):
 
         # liberar permissões
         try:
-            await ch.set_permissions(opener, view_channel=True, send_messages=True, attach_files=True, embed_links=True)
+            await ratelimit.call("channel", ch.id, ch.set_permissions, opener, view_channel=True, send_messages=True, attach_files=True, embed_links=True)
         except Exception:
             pass
 
@@ -439,7 +428,7 @@ class AcceptButton(discord.ui.Button):
             for item in list(self.view.children):  # type: ignore
                 if isinstance(item, discord.ui.Button):
                     item.disabled = True
-            await interaction.message.edit(view=self.view)
+            await ratelimit.call("channel", interaction.channel_id, interaction.message.edit, view=self.view)
         except Exception:
             pass
 
@@ -450,7 +439,7 @@ class AcceptButton(discord.ui.Button):
             color=discord.Color.green()
         )
         _brand(emb)
-        await ch.send(embed=emb)
+        await ratelimit.send(ch, embed=emb)
 
         # DM
         try:
@@ -460,7 +449,7 @@ class AcceptButton(discord.ui.Button):
                 color=discord.Color.green()
             )
             _brand(dm)
-            await opener.send(embed=dm)
+            await ratelimit.send(opener, embed=dm)
         except Exception:
             pass
 
@@ -474,7 +463,7 @@ class AcceptButton(discord.ui.Button):
                     color=discord.Color.green()
                 )
                 _brand(lg)
-                await tlog.send(embed=lg)
+                await ratelimit.send(tlog, embed=lg)
 
         await _ephemeral_ok(interaction, "✔ Termos aceitos. Você já pode enviar mensagens.")
 
@@ -499,7 +488,7 @@ class DenyButton(discord.ui.Button):
                     color=discord.Color.red()
                 )
                 _brand(lg)
-                await tlog.send(embed=lg)
+                await ratelimit.send(tlog, embed=lg)
 
         # DM motivo do encerramento
         try:
@@ -510,14 +499,14 @@ class DenyButton(discord.ui.Button):
                     color=discord.Color.red()
                 )
                 _brand(dm)
-                await opener.send(embed=dm)
+                await ratelimit.send(opener, embed=dm)
         except Exception:
             pass
 
         await _ephemeral_ok(interaction, "🚪 Termos negados. Encerrando o ticket…")
         await asyncio.sleep(1.0)
         try:
-            await ch.delete(reason="Termos negados pelo solicitante")
+            await ratelimit.call("channel", ch.id, ch.delete, reason="Termos negados pelo solicitante")
         except Exception:
             pass
 
@@ -549,7 +538,7 @@ class AddUserModal(discord.ui.Modal, title="Adicionar membro ao ticket"):
             return await _ephemeral_ok(itx, "⚠️ Usuário inválido.")
 
         try:
-            await ch.set_permissions(member, view_channel=True, send_messages=True, attach_files=True, embed_links=True, read_message_history=True)
+            await ratelimit.call("channel", ch.id, ch.set_permissions, member, view_channel=True, send_messages=True, attach_files=True, embed_links=True, read_message_history=True)
         except Exception as e:
             return await _ephemeral_ok(itx, f"❌ Falha ao adicionar: `{e}`")
 
@@ -559,7 +548,7 @@ class AddUserModal(discord.ui.Modal, title="Adicionar membro ao ticket"):
             color=discord.Color.green()
         )
         _brand(emb)
-        await ch.send(embed=emb)
+        await ratelimit.send(ch, embed=emb)
         await _ephemeral_ok(itx, "✅ Adicionado.")
 
 class RemoveUserModal(discord.ui.Modal, title="Remover membro do ticket"):
@@ -587,7 +576,7 @@ class RemoveUserModal(discord.ui.Modal, title="Remover membro do ticket"):
         if not isinstance(member, discord.Member):
             return await _ephemeral_ok(itx, "⚠️ Usuário inválido.")
         try:
-            await ch.set_permissions(member, overwrite=None)
+            await ratelimit.call("channel", ch.id, ch.set_permissions, member, overwrite=None)
         except Exception as e:
             return await _ephemeral_ok(itx, f"❌ Falha ao remover: `{e}`")
 
@@ -597,7 +586,7 @@ class RemoveUserModal(discord.ui.Modal, title="Remover membro do ticket"):
             color=discord.Color.orange()
         )
         _brand(emb)
-        await ch.send(embed=emb)
+        await ratelimit.send(ch, embed=emb)
         await _ephemeral_ok(itx, "✅ Removido.")
 
 class CloseReasonModal(discord.ui.Modal, title="Encerrar Ticket — Motivo"):
@@ -640,7 +629,7 @@ async def _notify_opener(itx: discord.Interaction):
         _brand(emb)
         btn = discord.ui.View(timeout=120)
         btn.add_item(discord.ui.Button(label="Ir para o ticket", url=ch.jump_url, style=discord.ButtonStyle.link))
-        await opener.send(embed=emb, view=btn)
+        await ratelimit.send(opener, embed=emb, view=btn)
     except Exception as e:
         log.warning("Falha ao DM opener: %s", e)
         return await _ephemeral_ok(itx, "⚠️ Não consegui enviar **DM** (provável bloqueio).")
@@ -651,37 +640,100 @@ async def _notify_opener(itx: discord.Interaction):
         color=discord.Color.green()
     )
     _brand(ok)
-    await ch.send(embed=ok)
+    await ratelimit.send(ch, embed=ok)
     await _ephemeral_ok(itx, "✅ Notificado por DM.")
 
 # ============ ENCERRAMENTO (com transcript + log) ============
-# ================== FILA DE FECHAMENTO (seguro + logs + posição) ==================
-close_queue: asyncio.Queue = asyncio.Queue()
-current_processing: Optional[str] = None
+# ================== FILA DE FECHAMENTO (paralela + justa + logs + posição) ==================
+CLOSE_WORKERS: int = max(1, env.get_int("TICKET_CLOSE_WORKERS", 3))
+CLOSE_REST_PER_SECOND: float = float(env.get("TICKET_CLOSE_REST_PER_SECOND", "4") or 4)
+CLOSE_REST_BURST: int = max(1, env.get_int("TICKET_CLOSE_REST_BURST", 8))
+DELETE_GRACE_SECONDS: float = float(env.get("TICKET_DELETE_GRACE_SECONDS", "3") or 0)
+# job que falha volta para a fila após RETRY_BASE * 2^(tentativa-1) s; depois de MAX_ATTEMPTS é marcado como falho
+CLOSE_MAX_ATTEMPTS: int = max(1, env.get_int("TICKET_CLOSE_MAX_ATTEMPTS", 4))
+CLOSE_RETRY_BASE_SECONDS: float = float(env.get("TICKET_CLOSE_RETRY_BASE_SECONDS", "15") or 15)
+# espelha imagens anexadas no HostGator antes de renderizar (links do CDN expiram)
+MIRROR_ATTACHMENTS: bool = env.get_bool("TICKET_MIRROR_ATTACHMENTS", False)
+
+# orçamento REST do fechamento (todas as guilds juntas), no limitador compartilhado
+limiter.configure("ticket_close", CLOSE_REST_PER_SECOND, CLOSE_REST_BURST, charge_global=False)
+
+
+class _FairCloseQueue:
+    """Fila justa: alterna entre guilds e, dentro de cada guild, entre categorias."""
+
+    def __init__(self):
+        self._guilds: "OrderedDict[int, OrderedDict[str, Deque[tuple]]]" = OrderedDict()
+        self._ready = asyncio.Semaphore(0)
+        self._size = 0
+
+    def qsize(self) -> int:
+        return self._size
+
+    def put_nowait(self, guild_id: int, category_key: str, item: tuple):
+        cats = self._guilds.setdefault(guild_id, OrderedDict())
+        cats.setdefault(category_key, deque()).append(item)
+        self._size += 1
+        self._ready.release()
+
+    async def get(self) -> tuple:
+        await self._ready.acquire()
+        guild_id, cats = next(iter(self._guilds.items()))
+        category_key, items = next(iter(cats.items()))
+        item = items.popleft()
+        self._size -= 1
+
+        # round-robin: categoria e guild atendidas vão para o fim da fila
+        if items:
+            cats.move_to_end(category_key)
+        else:
+            del cats[category_key]
+        if cats:
+            self._guilds.move_to_end(guild_id)
+        else:
+            del self._guilds[guild_id]
+        return item
+
+
+close_queue = _FairCloseQueue()
+processing: Dict[int, str] = {}      # channel_id -> nome (em processamento)
+_bg_tasks: set[asyncio.Task] = set() # deleções agendadas (referência forte)
+
+async def _send_transcript_queue_log(guild: Optional[discord.Guild], embed: discord.Embed):
+    if not TRANSCRIPT_LOG_CHANNEL_ID or not guild:
+        return
+    ch_log = guild.get_channel(TRANSCRIPT_LOG_CHANNEL_ID)
+    if isinstance(ch_log, discord.TextChannel):
+        _brand(embed)
+        await limiter.acquire("ticket_close")
+        await ratelimit.send(ch_log, embed=embed)
 
 async def _process_close(itx: discord.Interaction, category_key: str, reason: str):
-    """Adiciona o ticket na fila de fechamento e envia logs com posição."""
+    """Registra o ticket no diário, coloca na fila de fechamento e envia logs com posição."""
+    ch = itx.channel
+    if not isinstance(ch, discord.TextChannel) or not itx.guild:
+        return await _ephemeral_ok(itx, "❌ Use dentro do canal do ticket.")
+    if not _is_admin(itx.user):
+        return await _ephemeral_ok(itx, "❌ Apenas equipe pode encerrar.")
+    if journal.active_for_channel(ch.id):
+        return await _ephemeral_ok(itx, "🕒 Este ticket já está na fila de fechamento.")
+
+    opener_id_raw = _topic_kv(ch.topic, "opener")
+    job = journal.add(
+        guild_id=itx.guild.id,
+        channel_id=ch.id,
+        channel_name=ch.name,
+        closer_id=itx.user.id,
+        category=category_key,
+        reason=reason,
+        opener_id=int(opener_id_raw) if opener_id_raw.isdigit() else 0,
+    )
     pos = close_queue.qsize() + 1
-    await close_queue.put((itx, category_key, reason))
-
-    log.info(f"🕒 Ticket '{itx.channel.name}' adicionado à fila (posição {pos})")
-
-    # Log visual no canal de transcripts, se existir
-    if TRANSCRIPT_LOG_CHANNEL_ID:
-        ch_log = itx.guild.get_channel(TRANSCRIPT_LOG_CHANNEL_ID)
-        if isinstance(ch_log, discord.TextChannel):
-            emb = discord.Embed(
-                title="🕒 Ticket adicionado à fila",
-                description=f"**Canal:** {itx.channel.mention}\n"
-                            f"**Encerrado por:** {itx.user.mention}\n"
-                            f"**Posição na fila:** `{pos}`\n"
-                            f"**Motivo:** `{reason or '—'}`",
-                color=discord.Color.orange(),
-                timestamp=dt.datetime.now()
-            )
-            _brand(emb)
-            await ch_log.send(embed=emb)
+    close_queue.put_nowait(job.guild_id, job.category, job)
+
+    log.info(f"🕒 Ticket '{ch.name}' adicionado à fila (job #{job.id}, posição {pos})")
 
+    # responde primeiro: a interação expira em 3s e o log abaixo pode esperar o rate limit
     await _ephemeral_ok(
         itx,
         f"🕒 Ticket adicionado à fila de fechamento.\n"
@@ -689,217 +741,274 @@ async def _process_close(itx: discord.Interaction, category_key: str, reason: st
         f"Aguarde enquanto processamos outros transcripts..."
     )
 
-async def close_worker(bot: commands.Bot):
-    """Processa tickets da fila um por vez, com logs e contador."""
-    global current_processing
-    log.info("🧩 Worker de fechamento iniciado com sucesso.")
+    # Log visual no canal de transcripts, se existir (em segundo plano)
+    task = asyncio.create_task(_send_transcript_queue_log(itx.guild, discord.Embed(
+        title="🕒 Ticket adicionado à fila",
+        description=f"**Canal:** {ch.mention}\n"
+                    f"**Encerrado por:** {itx.user.mention}\n"
+                    f"**Posição na fila:** `{pos}`\n"
+                    f"**Motivo:** `{reason or '—'}`",
+        color=discord.Color.orange(),
+        timestamp=dt.datetime.now()
+    )))
+    _bg_tasks.add(task)
+    task.add_done_callback(_bg_tasks.discard)
+
+async def close_worker(bot: commands.Bot, worker_id: int = 0):
+    """Processa jobs da fila (vários workers em paralelo), com logs e contador."""
+    log.info(f"🧩 Worker de fechamento #{worker_id} iniciado com sucesso.")
     while True:
-        itx, category_key, reason = await close_queue.get()
+        job: CloseJob = await close_queue.get()
+        processing[job.channel_id] = job.channel_name
+        guild = bot.get_guild(job.guild_id)
         try:
-            ch = getattr(itx, "channel", None)
-            current_processing = ch.name if ch else "Desconhecido"
-            fila_restante = close_queue.qsize()
-
-            log.info(f"🚀 Processando '{current_processing}' (restantes: {fila_restante})")
+            log.info(
+                f"🚀 [w{worker_id}] Processando '{job.channel_name}' (job #{job.id}, etapa '{job.stage}', "
+                f"restantes: {close_queue.qsize()}, em paralelo: {len(processing)})"
+            )
 
             # Log início
-            if TRANSCRIPT_LOG_CHANNEL_ID and itx.guild:
-                ch_log = itx.guild.get_channel(TRANSCRIPT_LOG_CHANNEL_ID)
-                if isinstance(ch_log, discord.TextChannel):
-                    e = discord.Embed(
-                        title="🚀 Iniciando fechamento de ticket",
-                        description=f"**Canal:** {ch.mention}\n**Responsável:** {itx.user.mention}",
-                        color=discord.Color.blurple(),
-                        timestamp=dt.datetime.now()
-                    )
-                    _brand(e)
-                    await ch_log.send(embed=e)
-
-            await _process_close_real(itx, category_key, reason)
+            await _send_transcript_queue_log(guild, discord.Embed(
+                title="🚀 Iniciando fechamento de ticket",
+                description=f"**Canal:** <#{job.channel_id}>\n**Responsável:** <@{job.closer_id}>",
+                color=discord.Color.blurple(),
+                timestamp=dt.datetime.now()
+            ))
+
+            await _process_close_real(bot, job)
 
             # Log finalização
-            if TRANSCRIPT_LOG_CHANNEL_ID and itx.guild:
-                ch_log = itx.guild.get_channel(TRANSCRIPT_LOG_CHANNEL_ID)
-                if isinstance(ch_log, discord.TextChannel):
-                    e2 = discord.Embed(
-                        title="✅ Ticket finalizado da fila",
-                        description=f"**Canal:** `{current_processing}`\n**Encerrado por:** {itx.user.mention}",
-                        color=discord.Color.green(),
-                        timestamp=dt.datetime.now()
-                    )
-                    _brand(e2)
-                    await ch_log.send(embed=e2)
+            await _send_transcript_queue_log(guild, discord.Embed(
+                title="✅ Ticket finalizado da fila",
+                description=f"**Canal:** `{job.channel_name}`\n**Encerrado por:** <@{job.closer_id}>",
+                color=discord.Color.green(),
+                timestamp=dt.datetime.now()
+            ))
 
         except Exception as e:
-            log.exception(f"Erro no fechamento da fila: {e}")
+            log.exception(f"Erro no fechamento da fila (job #{job.id}, etapa '{job.stage}'): {e}")
+            _retry_or_fail(guild, job, f"{type(e).__name__}: {e}")
         finally:
-            current_processing = None
-            close_queue.task_done()
-        await asyncio.sleep(3)
+            processing.pop(job.channel_id, None)
 
-# ================== FUNÇÃO REAL DE FECHAMENTO ==================
+def _retry_or_fail(guild: Optional[discord.Guild], job: CloseJob, error: str):
+    """Reagenda o job com backoff exponencial; esgotadas as tentativas, marca como falho no diário."""
+    attempts = journal.record_error(job, error)
+    if attempts < CLOSE_MAX_ATTEMPTS:
+        delay = CLOSE_RETRY_BASE_SECONDS * (2 ** (attempts - 1))
+        log.warning(f"🔁 Job #{job.id} volta para a fila em {delay:.0f}s (tentativa {attempts + 1}/{CLOSE_MAX_ATTEMPTS})")
 
-async def _process_close_real(itx: discord.Interaction, category_key: str, reason: str):
-    import datetime as dt
-    import tempfile
-    import re
-    from cogs.transcript_html_core import generate_transcript_html
-    from utils.ftp_uploader import upload_to_hostgator
+        async def _requeue():
+            await asyncio.sleep(delay)
+            close_queue.put_nowait(job.guild_id, job.category, job)
 
-    bot = itx.client
-    ch = itx.channel
-    guild = itx.guild
-    if not isinstance(ch, discord.TextChannel) or not guild:
-        return await _ephemeral_ok(itx, "❌ Use dentro do canal do ticket.")
-    if not _is_admin(itx.user):
-        return await _ephemeral_ok(itx, "❌ Apenas equipe pode encerrar.")
+        task = asyncio.create_task(_requeue())
+    else:
+        journal.fail(job, error)
+        log.error(f"❌ Job #{job.id} ('{job.channel_name}') falhou {attempts}x — fechamento abandonado")
+        task = asyncio.create_task(_send_transcript_queue_log(guild, discord.Embed(
+            title="❌ Falha ao fechar ticket",
+            description=f"**Canal:** <#{job.channel_id}> (`{job.channel_name}`)\n"
+                        f"**Tentativas:** `{attempts}`\n**Erro:** `{error[:300]}`\n"
+                        f"O ticket pode ser encerrado novamente.",
+            color=discord.Color.red(),
+            timestamp=dt.datetime.now()
+        )))
+    _bg_tasks.add(task)
+    task.add_done_callback(_bg_tasks.discard)
+
+def start_close_workers(bot: commands.Bot):
+    """Sobe o pool de workers uma única vez por processo e retoma jobs pendentes do diário."""
+    if getattr(bot, "_close_worker_started", False):
+        return
+    for i in range(CLOSE_WORKERS):
+        bot.loop.create_task(close_worker(bot, i))
+    bot._close_worker_started = True
+    log.info(f"🧩 {CLOSE_WORKERS} workers de fechamento iniciados.")
+
+    pendentes = journal.pending()
+    for job in pendentes:
+        close_queue.put_nowait(job.guild_id, job.category, job)
+    if pendentes:
+        log.warning(f"♻️ Retomando {len(pendentes)} fechamento(s) interrompido(s) do diário")
+
+def _remove_work_files(job: CloseJob):
+    paths = [job.messages_path] + [o[0] for o in json.loads(job.outputs or "[]")]
+    for path in paths:
+        if path:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
 
-    opener_id_raw = _topic_kv(ch.topic, "opener")
-    opener = guild.get_member(int(opener_id_raw)) if opener_id_raw and opener_id_raw.isdigit() else None
+async def _delete_later(ch: Optional[discord.TextChannel], job: CloseJob, reason: str, delay: float):
+    """Apaga o canal após o aviso final, sem segurar o worker, e encerra o job."""
+    if ch is not None:
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await limiter.acquire("ticket_close")
+        try:
+            await ratelimit.call("channel", ch.id, ch.delete, reason=reason)
+        except Exception as e:
+            log.error(f"Erro ao deletar canal: {e}")
+    journal.advance(job, "delete")
+    _remove_work_files(job)
+    if capture is not None:
+        capture.drop(job.channel_id)
+    journal.advance(job, "done")
 
-    transcript_url = None
-    try:
-        mensagens_coletadas = []
-        async for msg in ch.history(limit=None, oldest_first=True):
-            if msg.author.bot and not msg.content and not msg.embeds and not msg.attachments:
-                continue
-
-            # ===== CARGO VISUAL =====
-            role_html = ""
-            if isinstance(msg.author, discord.Member):
-                roles = [r for r in msg.author.roles if r.name != "@everyone"]
-                if roles:
-                    top_role = max(roles, key=lambda r: r.position)
-                    role_color = f"#{top_role.color.value:06x}" if top_role.color.value != 0 else "#b9bbbe"
-                    role_html = (
-                        f'<span class="role" style="color:{role_color};background-color:{role_color}22;'
-                        f'border:1px solid {role_color}55;padding:2px 6px;border-radius:5px;'
-                        f'font-size:12px;font-weight:600;margin-left:6px;">'
-                        f'{discord.utils.escape_markdown(top_role.name)}</span>'
-                    )
-
-            # ===== MENÇÕES E TEMPO =====
-            def clean_mentions(content: str) -> str:
-                if not content:
-                    return ""
-                content = re.sub(r"<@!?(\d+)>", lambda m: f"@{guild.get_member(int(m.group(1))) or m.group(1)}", content)
-                content = re.sub(r"<@&(\d+)>", lambda m: f"@{guild.get_role(int(m.group(1))) or m.group(1)}", content)
-                content = re.sub(r"<#(\d+)>", lambda m: f"#{guild.get_channel(int(m.group(1))) or m.group(1)}", content)
-                content = re.sub(
-                    r"<t:(\d+):[a-zA-Z]>",
-                    lambda m: dt.datetime.fromtimestamp(int(m.group(1))).strftime("%d/%m/%Y %H:%M:%S"),
-                    content
-                )
-                return content
-
-            content_fixed = clean_mentions(msg.content or "")
-            attachments_urls = [a.url for a in msg.attachments]
-
-            # ===== EMBEDS =====
-            embed_data = []
-            for emb in msg.embeds:
-                d = emb.to_dict()
-                fields = [
-                    {"name": f.get("name") or "", "value": f.get("value") or "", "inline": bool(f.get("inline"))}
-                    for f in d.get("fields", []) or []
-                ]
-                embed_data.append({
-                    "title": d.get("title"),
-                    "description": d.get("description"),
-                    "color": f"#{d.get('color'):06x}" if d.get("color") else "#5865F2",
-                    "image": (d.get("image") or {}).get("url"),
-                    "thumbnail": (d.get("thumbnail") or {}).get("url"),
-                    "fields": fields,
-                    "footer_text": (d.get("footer") or {}).get("text"),
-                    "footer_icon": (d.get("footer") or {}).get("icon_url"),
-                })
-
-            avatar_url = (
-                str(msg.author.display_avatar.url)
-                if getattr(msg.author, "display_avatar", None)
-                else "https://cdn.discordapp.com/embed/avatars/0.png"
+def _write_json(path: str, data) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+
+def _read_json(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+# ================== FUNÇÃO REAL DE FECHAMENTO ==================
+
+async def _process_close_real(bot: commands.Bot, job: CloseJob):
+    """Executa as etapas pendentes do job: collect → render → upload → notify → delete.
+    Cada etapa concluída é gravada no diário; um restart recomeça da próxima."""
+    loop = asyncio.get_running_loop()
+    guild = bot.get_guild(job.guild_id)
+    ch = guild.get_channel(job.channel_id) if guild else None
+    if not isinstance(ch, discord.TextChannel):
+        ch = None
+    closer_mention = f"<@{job.closer_id}>"
+    reason = job.reason
+
+    if guild is None or (ch is None and not job.done("notify")):
+        # canal já não existe (apagado manualmente / bot fora da guild): nada a retomar
+        log.warning(f"Job #{job.id}: canal {job.channel_id} indisponível — encerrando job")
+        _remove_work_files(job)
+        journal.advance(job, "done")
+        return
+
+    # ===== COLETA (+ espelhamento dos anexos, se ligado) =====
+    if not job.done("collect"):
+        session = http_client.session_for(bot)
+        header_img = str(guild.icon.url) if guild.icon else DEFAULT_HEADER
+        # paged/auto linkam as imagens em vez de embutir: mirror obrigatório
+        if MIRROR_ATTACHMENTS or needs_mirror(formats_for(job.category)):
+            # anexos sobem enquanto o histórico ainda está sendo paginado
+            mirrors = AttachmentMirror(session)
+            mensagens_coletadas = await collect_history(ch, capture, on_message=mirrors.submit_message)
+            header_img = await mirror_stage(mensagens_coletadas, header_img, session, mirrors)
+        else:
+            mensagens_coletadas = await collect_history(ch, capture)
+        payload = {"header_img": header_img, "messages": [m.to_dict() for m in mensagens_coletadas]}
+        path = job.work_path("_messages.json")
+        await loop.run_in_executor(None, _write_json, path, payload)
+        journal.advance(job, "collect", messages_path=path)
+
+    # ===== GERAR TRANSCRIPT (formatos da categoria) =====
+    if not job.done("render"):
+        # sem try: uma falha aqui (disco, prefetch) sobe para o worker, que reagenda o job
+        # (_retry_or_fail) — nunca segue para o delete sem transcript
+        payload = await loop.run_in_executor(None, _read_json, job.messages_path)
+        # escreve direto no disco, bloco a bloco (memória estável em tickets longos)
+        rendered = await render_stage(
+            job.channel_name,
+            [TranscriptMessage.from_dict(d) for d in payload["messages"]],
+            payload["header_img"],
+            job.work_path(""),
+            f"{dt.datetime.fromtimestamp(job.created_at):%Y-%m-%d_%H-%M-%S}-{job.channel_name}",
+            formats_for(job.category),
+            http_client.session_for(bot),
+        )
+        if not rendered:
+            # render_outputs tolera falha de um formato; nenhum formato gerado é falha do job
+            raise RuntimeError("nenhum formato do transcript foi gerado")
+        outputs = [[path, remote, ""] for path, remote in rendered]
+        journal.advance(job, "render", outputs=json.dumps(outputs, ensure_ascii=False))
+
+    # ===== UPLOAD =====
+    if not job.done("upload"):
+        outputs = json.loads(job.outputs or "[]")
+        # link principal = primeiro formato que subiu
+        transcript_url = await upload_stage(outputs)
+        journal.advance(job, "upload", transcript_url=transcript_url, outputs=json.dumps(outputs, ensure_ascii=False))
+
+    transcript_url = job.transcript_url or None
+
+    # ===== AVISOS =====
+    if not job.done("notify"):
+        # ====== LOG CENTRALIZADO (usa LogsCog) ======
+        emb = discord.Embed(
+            title="📁 Ticket Encerrado",
+            description=(
+                f"**Canal:** <#{job.channel_id}>\n"
+                f"**Encerrado por:** {closer_mention}\n"
+                f"**Motivo:** `{reason or '—'}`\n"
+                f"**Data:** <t:{int(job.created_at)}:f>"
+            ),
+            color=discord.Color.red()
+        )
+        if transcript_url:
+            emb.add_field(name="🔗 Transcript", value=f"[Abrir Transcript]({transcript_url})", inline=False)
+        extras = [
+            o for o in json.loads(job.outputs or "[]")
+            if o[2] and o[2] != transcript_url and not is_auxiliary(o[1])
+        ]
+        if extras:
+            emb.add_field(
+                name="📦 Outros formatos",
+                value=" • ".join(f"[{format_label(o[1])}]({o[2]})" for o in extras)[:1024],
+                inline=False,
             )
+        _brand(emb)
+        await limiter.acquire("ticket_close")
+        await _send_ticket_log(bot, guild, emb)  # 🔥 cai no mesmo canal do logs.py
 
-            mensagens_coletadas.append({
-                "time": msg.created_at.strftime("%d/%m/%Y %H:%M:%S"),
-                "author": str(getattr(msg.author, "display_name", getattr(msg.author, "name", "Usuário"))),
-                "content": content_fixed,
-                "attachments": attachments_urls,
-                "embeds": embed_data,
-                "avatar": avatar_url,
-                "role_html": role_html
-            })
-
-        # ===== GERAR HTML =====
-        header_img = str(guild.icon.url) if guild.icon else "https://cdn.discordapp.com/embed/avatars/1.png"
-        html = await generate_transcript_html(ch.name, mensagens_coletadas, header_img)
-
-        temp = tempfile.NamedTemporaryFile(delete=False, suffix=".html")
-        temp.write(html.encode("utf-8"))
-        temp.close()
-
-        filename = f"{dt.datetime.now():%Y-%m-%d_%H-%M-%S}-{ch.name}.html"
-        transcript_url = await upload_to_hostgator(temp.name, filename)
-    except Exception as e:
-        log.error(f"Erro ao gerar transcript: {e}")
-
-    # ====== LOG CENTRALIZADO (usa LogsCog) ======
-    emb = discord.Embed(
-        title="📁 Ticket Encerrado",
-        description=(
-            f"**Canal:** {ch.mention}\n"
-            f"**Encerrado por:** {itx.user.mention}\n"
-            f"**Motivo:** `{reason or '—'}`\n"
-            f"**Data:** <t:{int(dt.datetime.now().timestamp())}:f>"
-        ),
-        color=discord.Color.red()
-    )
-    if transcript_url:
-        emb.add_field(name="🔗 Transcript", value=f"[Abrir Transcript]({transcript_url})", inline=False)
-    _brand(emb)
-    await _send_ticket_log(bot, guild, emb)  # 🔥 cai no mesmo canal do logs.py
+        # ====== AVISAR USUÁRIO (DM) ======
+        opener = guild.get_member(job.opener_id) if job.opener_id else None
+        if isinstance(opener, discord.Member):
+            try:
+                dm = discord.Embed(
+                    title="🧾 Ticket encerrado",
+                    description=(
+                        f"Seu ticket **{job.channel_name}** foi encerrado por {closer_mention}.\n"
+                        f"**Motivo:** `{reason or '—'}`"
+                    ),
+                    color=discord.Color.red()
+                )
+                _brand(dm)
+                await limiter.acquire("ticket_close")
+                if transcript_url:
+                    view = discord.ui.View()
+                    view.add_item(discord.ui.Button(label="📄 Abrir Transcript", url=transcript_url, style=discord.ButtonStyle.link))
+                    await ratelimit.send(opener, embed=dm, view=view)
+                else:
+                    await ratelimit.send(opener, embed=dm)
+            except Exception as e:
+                log.warning(f"Falha ao enviar DM ao usuário: {e}")
 
-    # ====== AVISAR USUÁRIO (DM) ======
-    if isinstance(opener, discord.Member):
+        # ====== MENSAGEM FINAL NO CANAL ======
         try:
-            dm = discord.Embed(
-                title="🧾 Ticket encerrado",
-                description=(
-                    f"Seu ticket **{ch.name}** foi encerrado por {itx.user.mention}.\n"
-                    f"**Motivo:** `{reason or '—'}`"
-                ),
+            done = discord.Embed(
+                title="✅ Ticket encerrado",
+                description=f"Encerrado por {closer_mention}.\n**Motivo:** `{reason or '—'}`",
                 color=discord.Color.red()
             )
-            _brand(dm)
+            _brand(done)
+            view_done = discord.ui.View()
             if transcript_url:
-                view = discord.ui.View()
-                view.add_item(discord.ui.Button(label="📄 Abrir Transcript", url=transcript_url, style=discord.ButtonStyle.link))
-                await opener.send(embed=dm, view=view)
-            else:
-                await opener.send(embed=dm)
-        except Exception as e:
-            log.warning(f"Falha ao enviar DM ao usuário: {e}")
-
-    # ====== MENSAGEM FINAL NO CANAL ======
-    try:
-        done = discord.Embed(
-            title="✅ Ticket encerrado",
-            description=f"Encerrado por {itx.user.mention}.\n**Motivo:** `{reason or '—'}`",
-            color=discord.Color.red()
-        )
-        _brand(done)
-        view_done = discord.ui.View()
-        if transcript_url:
-            view_done.add_item(discord.ui.Button(label="📄 Abrir Transcript", url=transcript_url, style=discord.ButtonStyle.link))
-        await ch.send(embed=done, view=view_done)
-    except Exception:
-        pass
+                view_done.add_item(discord.ui.Button(label="📄 Abrir Transcript", url=transcript_url, style=discord.ButtonStyle.link))
+            await limiter.acquire("ticket_close")
+            await ratelimit.send(ch, embed=done, view=view_done)
+        except Exception:
+            pass
+        journal.advance(job, "notify")
 
-    await asyncio.sleep(3)
-    try:
-        await ch.delete(reason=f"Ticket fechado por {itx.user} | motivo: {reason or '—'}")
-    except Exception as e:
-        log.error(f"Erro ao deletar canal: {e}")
+    # ===== DELETE =====
+    # canal some depois do aviso final; o worker já segue para o próximo ticket
+    closer = guild.get_member(job.closer_id)
+    task = asyncio.create_task(_delete_later(
+        ch, job, f"Ticket fechado por {closer or job.closer_id} | motivo: {reason or '—'}", DELETE_GRACE_SECONDS
+    ))
+    _bg_tasks.add(task)
+    task.add_done_callback(_bg_tasks.discard)
 
 
 # ================== Slash Commands (extras) ==================
@@ -924,7 +1033,7 @@ class TicketSlash(commands.Cog):
         if not isinstance(member, discord.Member):
             return await _ephemeral_ok(itx, "⚠️ Usuário inválido.")
         try:
-            await ch.set_permissions(member, view_channel=True, send_messages=True, attach_files=True, embed_links=True, read_message_history=True)
+            await ratelimit.call("channel", ch.id, ch.set_permissions, member, view_channel=True, send_messages=True, attach_files=True, embed_links=True, read_message_history=True)
         except Exception as e:
             return await _ephemeral_ok(itx, f"❌ Falha ao adicionar: `{e}`")
         emb = discord.Embed(
@@ -933,7 +1042,7 @@ class TicketSlash(commands.Cog):
             color=discord.Color.green()
         )
         _brand(emb)
-        await ch.send(embed=emb)
+        await ratelimit.send(ch, embed=emb)
         await _ephemeral_ok(itx, "✅ Adicionado.")
 
     @app_commands.command(name="remove", description="Remover um membro do ticket atual.")
@@ -950,7 +1059,7 @@ class TicketSlash(commands.Cog):
         if not isinstance(member, discord.Member):
             return await _ephemeral_ok(itx, "⚠️ Usuário inválido.")
         try:
-            await ch.set_permissions(member, overwrite=None)
+            await ratelimit.call("channel", ch.id, ch.set_permissions, member, overwrite=None)
         except Exception as e:
             return await _ephemeral_ok(itx, f"❌ Falha ao remover: `{e}`")
         emb = discord.Embed(
@@ -959,7 +1068,7 @@ class TicketSlash(commands.Cog):
             color=discord.Color.orange()
         )
         _brand(emb)
-        await ch.send(embed=emb)
+        await ratelimit.send(ch, embed=emb)
         await _ephemeral_ok(itx, "✅ Removido.")
 
     @app_commands.command(name="notify", description="(Equipe) Notificar o solicitante por DM.")
@@ -988,11 +1097,8 @@ class TicketSystem(commands.Cog):
         channel_id = env.ticket_panel_channel()
         channel = guild.get_channel(channel_id) if guild else None
 
-        # Inicia o worker da fila
-        if not hasattr(self.bot, "_close_worker_started"):
-            self.bot.loop.create_task(close_worker(self.bot))
-            self.bot._close_worker_started = True
-            log.info("🧩 Worker de fechamento iniciado com sucesso.")
+        # Inicia os workers da fila
+        start_close_workers(self.bot)
 
         if channel:
             try:
@@ -1029,7 +1135,7 @@ class TicketSystem(commands.Cog):
             # 🎟️ View com menu de categorias
             view = TicketPanelView(custom_id="ticket_panel_view")
 
-            await canal.send(embed=embed, view=view)
+            await ratelimit.send(canal, embed=embed, view=view)
             log.info(f"✅ Painel de tickets enviado com sucesso em {canal.name}")
 
         except Exception as e:
@@ -1042,11 +1148,8 @@ class TicketSystem(commands.Cog):
         channel_id = env.ticket_panel_channel()
         channel = guild.get_channel(channel_id) if guild else None
 
-        # Inicia o worker da fila
-        if not hasattr(self.bot, "_close_worker_started"):
-            self.bot.loop.create_task(close_worker(self.bot))
-            self.bot._close_worker_started = True
-            log.info("🧩 Worker de fechamento iniciado com sucesso.")
+        # Inicia os workers da fila
+        start_close_workers(self.bot)
 
         if channel:
             try:
@@ -1065,11 +1168,8 @@ class TicketSystem(commands.Cog):
         channel_id = env.ticket_panel_channel()
         channel = guild.get_channel(channel_id) if guild else None
 
-        # Inicia o worker da fila
-        if not hasattr(self.bot, "_close_worker_started"):
-            self.bot.loop.create_task(close_worker(self.bot))
-            self.bot._close_worker_started = True
-            log.info("🧩 Worker de fechamento iniciado com sucesso.")
+        # Inicia os workers da fila
+        start_close_workers(self.bot)
 
         if channel:
             try:
@@ -1083,6 +1183,63 @@ class TicketSystem(commands.Cog):
 
 
 
+    # ---------- Captura ao vivo (TICKET_LIVE_CAPTURE=1) ----------
+    @staticmethod
+    def _is_ticket(ch) -> bool:
+        return isinstance(ch, discord.TextChannel) and bool(_topic_kv(ch.topic, "opener"))
+
+    @commands.Cog.listener()
+    async def on_message(self, message: discord.Message):
+        if capture is None or not message.guild or not self._is_ticket(message.channel):
+            return
+        data = collect_message(message, message.guild)
+        if data:
+            capture.upsert(message.channel.id, message.id, data.to_dict())
+
+    @commands.Cog.listener("on_ready")
+    async def _capture_resumed(self):
+        # nova sessão no gateway (restart/crash/reconexão sem RESUME): eventos do intervalo
+        # não foram entregues — o fechamento busca esse trecho via REST
+        if capture is not None:
+            capture.open_gap(discord.utils.time_snowflake(discord.utils.utcnow()))
+
+    @commands.Cog.listener()
+    async def on_disconnect(self):
+        if capture is not None:
+            capture.mark_alive(discord.utils.time_snowflake(discord.utils.utcnow()))
+
+    @commands.Cog.listener()
+    async def on_raw_message_edit(self, payload: discord.RawMessageUpdateEvent):
+        if capture is None or not payload.guild_id:
+            return
+        guild = self.bot.get_guild(payload.guild_id)
+        if not guild or not self._is_ticket(guild.get_channel(payload.channel_id)):
+            return
+        changes = {}
+        if "content" in payload.data:
+            changes["content"] = discord_mentions_to_text(payload.data.get("content") or "", guild)
+        if "embeds" in payload.data:
+            changes["embeds"] = [embed_data(e) for e in payload.data.get("embeds") or []]
+        if changes:
+            capture.update(payload.channel_id, payload.message_id, **changes)
+
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent):
+        if capture is not None:
+            capture.mark_deleted(payload.channel_id, [payload.message_id])
+
+    @commands.Cog.listener()
+    async def on_raw_bulk_message_delete(self, payload: discord.RawBulkMessageDeleteEvent):
+        if capture is not None:
+            capture.mark_deleted(payload.channel_id, payload.message_ids)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel: discord.abc.GuildChannel):
+        # apagado fora da fila de fechamento: descarta a captura
+        if capture is not None and not journal.active_for_channel(channel.id):
+            capture.drop(channel.id)
+
+
 # ================== REGISTRO FINAL ==================
 async def setup(bot: commands.Bot):
     """Carrega views persistentes e registra comandos."""
@@ -0,0 +1,240 @@
+# cogs/transcript_formats.py
+# Formatos de saída do transcript a partir do mesmo modelo de mensagens:
+# html, html.gz / html.br (pré-comprimidos), jsonl (arquivo p/ reindexação) e md (texto leve)
+from __future__ import annotations
+
+import asyncio
+import datetime as dt
+import gzip
+import json
+import logging
+import re
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+import aiohttp
+
+from utils import env
+from cogs.transcript_html_core import write_transcript_html, render_pages, render_viewer_shell
+
+try:
+    import brotli
+    HAS_BROTLI = True
+except Exception:
+    HAS_BROTLI = False
+
+log = logging.getLogger("transcript_formats")
+
+DEFAULT_FORMATS: str = str(env.get("TRANSCRIPT_FORMATS", "html") or "html")
+PAGE_SIZE: int = env.get_int("TRANSCRIPT_PAGE_SIZE", 200)
+# formato "auto": página única até este número de mensagens, visualizador paginado acima
+PAGED_THRESHOLD: int = env.get_int("TRANSCRIPT_PAGED_THRESHOLD", 2000)
+
+# (caminho local, nome remoto)
+OutputFile = Tuple[str, str]
+
+
+@dataclass
+class TranscriptContext:
+    channel_name: str
+    messages: List[Dict]
+    header_img: str
+    local_base: str        # caminho local sem extensão
+    remote_base: str       # nome remoto sem extensão
+    session: Optional[aiohttp.ClientSession] = None
+    srcs: Optional[Dict[str, str]] = None   # imagens já embutidas (etapa inline)
+
+
+# =========================
+# Escritores
+# =========================
+class _BrotliFile:
+    """File-like mínimo: comprime incrementalmente o que o writer HTML escreve."""
+
+    def __init__(self, raw):
+        self._raw = raw
+        self._comp = brotli.Compressor(quality=int(env.get_int("TRANSCRIPT_BROTLI_QUALITY", 6)))
+
+    def write(self, data: bytes) -> int:
+        self._raw.write(self._comp.process(data))
+        return len(data)
+
+    def finish(self):
+        self._raw.write(self._comp.finish())
+
+
+async def write_html(ctx: TranscriptContext) -> List[OutputFile]:
+    path = f"{ctx.local_base}.html"
+    with open(path, "wb") as f:
+        await write_transcript_html(f, ctx.channel_name, ctx.messages, ctx.header_img, ctx.session, ctx.srcs)
+    return [(path, f"{ctx.remote_base}.html")]
+
+
+async def write_html_gz(ctx: TranscriptContext) -> List[OutputFile]:
+    path = f"{ctx.local_base}.html.gz"
+    with open(path, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6, mtime=0) as gz:
+        await write_transcript_html(gz, ctx.channel_name, ctx.messages, ctx.header_img, ctx.session, ctx.srcs)
+    return [(path, f"{ctx.remote_base}.html.gz")]
+
+
+async def write_html_br(ctx: TranscriptContext) -> List[OutputFile]:
+    path = f"{ctx.local_base}.html.br"
+    with open(path, "wb") as raw:
+        br = _BrotliFile(raw)
+        await write_transcript_html(br, ctx.channel_name, ctx.messages, ctx.header_img, ctx.session, ctx.srcs)
+        br.finish()
+    return [(path, f"{ctx.remote_base}.html.br")]
+
+
+async def write_jsonl(ctx: TranscriptContext) -> List[OutputFile]:
+    """Uma linha de cabeçalho + uma linha por mensagem (compacto, bom para busca/reindexação)."""
+    path = f"{ctx.local_base}.jsonl"
+    with open(path, "w", encoding="utf-8") as f:
+        head = {
+            "type": "transcript",
+            "channel": ctx.channel_name,
+            "generated_at": dt.datetime.now(dt.timezone.utc).isoformat(),
+            "count": len(ctx.messages),
+        }
+        f.write(json.dumps(head, ensure_ascii=False, separators=(",", ":")) + "\n")
+        for i, m in enumerate(ctx.messages, 1):
+            f.write(json.dumps(m, ensure_ascii=False, separators=(",", ":")) + "\n")
+            if i % 500 == 0:
+                await asyncio.sleep(0)
+    return [(path, f"{ctx.remote_base}.jsonl")]
+
+
+def _md_message(m: Dict) -> str:
+    lines = [f"**{m.get('author', 'Usuário')}** — {m.get('time', '')}"]
+    if m.get("content"):
+        lines.append(m["content"])
+    for emb in m.get("embeds", []) or []:
+        if emb.get("title"):
+            lines.append(f"> **{emb['title']}**")
+        if emb.get("description"):
+            lines.extend(f"> {ln}" for ln in str(emb["description"]).splitlines())
+        for fld in emb.get("fields") or []:
+            lines.append(f"> *{fld.get('name', '')}:* {fld.get('value', '')}")
+    for att in m.get("attachments", []):
+        lines.append(f"📎 {att}")
+    return "\n".join(lines)
+
+
+async def write_markdown(ctx: TranscriptContext) -> List[OutputFile]:
+    path = f"{ctx.local_base}.md"
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"# Transcript — {ctx.channel_name}\n\n")
+        f.write(f"_Gerado em {dt.datetime.now():%d/%m/%Y %H:%M:%S} — {len(ctx.messages)} mensagens_\n\n")
+        for i, m in enumerate(ctx.messages, 1):
+            f.write(_md_message(m) + "\n\n")
+            if i % 500 == 0:
+                await asyncio.sleep(0)
+    return [(path, f"{ctx.remote_base}.md")]
+
+
+async def write_paged(ctx: TranscriptContext) -> List[OutputFile]:
+    """Shell leve + páginas JSON ({base}.pNNNN.json) carregadas sob demanda no navegador."""
+    pages = (len(ctx.messages) + PAGE_SIZE - 1) // PAGE_SIZE or 1
+    outputs: List[OutputFile] = []
+    first: List[str] = []
+    for n, page in enumerate(render_pages(ctx.messages, PAGE_SIZE)):
+        if n == 0:
+            first = page  # vai inline no shell
+            continue
+        path = f"{ctx.local_base}.p{n:04d}.json"
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"page": n, "messages": page}, f, ensure_ascii=False, separators=(",", ":"))
+        outputs.append((path, f"{ctx.remote_base}.p{n:04d}.json"))
+        await asyncio.sleep(0)
+
+    shell = render_viewer_shell(
+        ctx.channel_name, ctx.messages, first, pages, quote(f"{ctx.remote_base}.p"), ctx.header_img
+    )
+    path = f"{ctx.local_base}.paged.html"
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(shell)
+    # shell primeiro: é ele o link principal
+    return [(path, f"{ctx.remote_base}.paged.html")] + outputs
+
+
+async def write_auto(ctx: TranscriptContext) -> List[OutputFile]:
+    if len(ctx.messages) > PAGED_THRESHOLD:
+        return await write_paged(ctx)
+    return await write_html(ctx)
+
+
+FORMATS: Dict[str, Callable[[TranscriptContext], Awaitable[List[OutputFile]]]] = {
+    "html": write_html,
+    "html.gz": write_html_gz,
+    "jsonl": write_jsonl,
+    "md": write_markdown,
+    "paged": write_paged,
+    "auto": write_auto,
+}
+if HAS_BROTLI:
+    FORMATS["html.br"] = write_html_br
+
+
+# =========================
+# Seleção por categoria
+# =========================
+def formats_for(category: str = "") -> List[str]:
+    """TRANSCRIPT_FORMATS_<CATEGORIA> ou TRANSCRIPT_FORMATS (ex.: "html.gz,jsonl"). O primeiro é o principal."""
+    raw = env.get(f"TRANSCRIPT_FORMATS_{(category or '').upper()}", "") if category else ""
+    raw = str(raw or DEFAULT_FORMATS)
+    out: List[str] = []
+    for name in raw.replace(";", ",").split(","):
+        name = name.strip().lower()
+        if not name or name in out:
+            continue
+        if name not in FORMATS:
+            log.warning(f"[formats] Formato desconhecido/indisponível ignorado: {name!r}")
+            continue
+        out.append(name)
+    return out or ["html"]
+
+
+def resolve_formats(formats: List[str], message_count: int) -> List[str]:
+    """Troca "auto" por "paged"/"html" pelo tamanho — antes do inline, que o paged não usa."""
+    out: List[str] = []
+    for name in formats:
+        if name == "auto":
+            name = "paged" if message_count > PAGED_THRESHOLD else "html"
+        if name not in out:
+            out.append(name)
+    return out
+
+
+def needs_mirror(formats: List[str]) -> bool:
+    """O paged aponta direto para as URLs das imagens: sem mirror seriam links do CDN que expiram."""
+    return any(name in ("paged", "auto") for name in formats)
+
+
+def format_label(remote_name: str) -> str:
+    """Nome do formato a partir do arquivo remoto (sufixo mais longo conhecido)."""
+    if remote_name.lower().endswith(".paged.html"):
+        return "paged"
+    for name in sorted(FORMATS, key=len, reverse=True):
+        if remote_name.lower().endswith(f".{name}"):
+            return name
+    return remote_name.rsplit(".", 1)[-1]
+
+
+_PAGE_FILE = re.compile(r"\.p\d{4}\.json$")
+
+
+def is_auxiliary(remote_name: str) -> bool:
+    """Arquivos de apoio (páginas do visualizador) — sobem, mas não viram link."""
+    return bool(_PAGE_FILE.search(remote_name))
+
+
+async def render_outputs(ctx: TranscriptContext, formats: List[str]) -> List[OutputFile]:
+    """Gera todos os formatos pedidos; o primeiro arquivo da lista é o link principal."""
+    outputs: List[OutputFile] = []
+    for name in formats:
+        try:
+            outputs.extend(await FORMATS[name](ctx))
+        except Exception as e:
+            log.error(f"[formats] Falha ao gerar {name} para {ctx.channel_name}: {e}")
+    return outputs
@@ -3,47 +3,82 @@ from __future__ import annotations
 
 import datetime as dt
 import html
+import json
 import logging
-import base64
-from typing import List, Dict
+from typing import List, Dict, Iterable, AsyncIterator, BinaryIO, Optional, Tuple
+from urllib.parse import urlsplit
+import asyncio
 import re
+
 import aiohttp
 
+from utils import env
+from utils.media_cache import media_cache
+from utils.image_optimizer import (
+    BOUNDS_ATTACHMENT, BOUNDS_AVATAR, BOUNDS_EMBED, BOUNDS_HEADER, optimize, scaled,
+)
+
 log = logging.getLogger("transcript_html")
 
-def discord_mentions_to_text(content: str, guild=None) -> str:
-    """Converte menções do Discord (<@>, <@&>, <#>) em texto legível."""
-    if not content:
-        return ""
+FETCH_CONCURRENCY: int = env.get_int("TRANSCRIPT_FETCH_CONCURRENCY", 8)
+FETCH_PER_HOST: int = env.get_int("TRANSCRIPT_FETCH_PER_HOST", 4)
+FETCH_DEADLINE: int = env.get_int("TRANSCRIPT_FETCH_DEADLINE", 60)
 
-    def repl_user(match):
-        uid = match.group(1)
-        if guild:
-            m = guild.get_member(int(uid))
-            if m:
-                return f"@{m.display_name}"
-        return f"@{uid}"
-
-    def repl_role(match):
-        rid = match.group(1)
-        if guild:
-            r = guild.get_role(int(rid))
-            if r:
-                return f"@{r.name}"
-        return f"@&{rid}"
-
-    def repl_channel(match):
-        cid = match.group(1)
-        if guild:
-            c = guild.get_channel(int(cid))
-            if c:
-                return f"#{c.name}"
-        return f"#{cid}"
-
-    content = re.sub(r"<@!?(\d+)>", repl_user, content)
-    content = re.sub(r"<@&(\d+)>", repl_role, content)
-    content = re.sub(r"<#(\d+)>", repl_channel, content)
-    return content
+# Um único scan cobre <@id>, <@!id>, <@&id>, <#id>, <t:unix[:estilo]> e emoji custom <a:nome:id>
+_MENTION_RE = re.compile(
+    r"<(?:@!?(?P<user>\d+)|@&(?P<role>\d+)|#(?P<chan>\d+)"
+    r"|t:(?P<ts>-?\d+)(?::[a-zA-Z])?|a?:(?P<emoji>\w+):\d+)>"
+)
+
+class MentionResolver:
+    """Converte menções/timestamps/emojis em texto, com cache de nomes por transcript."""
+
+    __slots__ = ("guild", "_names")
+
+    def __init__(self, guild=None):
+        self.guild = guild
+        self._names: Dict[tuple, str] = {}
+
+    def _name(self, kind: str, raw: str) -> str:
+        key = (kind, raw)
+        name = self._names.get(key)
+        if name is not None:
+            return name
+        obj = None
+        if self.guild:
+            getter = {"user": self.guild.get_member, "role": self.guild.get_role, "chan": self.guild.get_channel}[kind]
+            obj = getter(int(raw))
+        if kind == "user":
+            name = f"@{obj.display_name}" if obj else f"@{raw}"
+        elif kind == "role":
+            name = f"@{obj.name}" if obj else f"@&{raw}"
+        else:
+            name = f"#{obj.name}" if obj else f"#{raw}"
+        self._names[key] = name
+        return name
+
+    def __call__(self, m: re.Match) -> str:
+        kind = m.lastgroup
+        raw = m.group(kind)
+        if kind == "ts":
+            try:
+                return dt.datetime.fromtimestamp(int(raw)).strftime("%d/%m/%Y %H:%M:%S")
+            except (OverflowError, OSError, ValueError):
+                return m.group(0)
+        if kind == "emoji":
+            return f":{raw}:"
+        return self._name(kind, raw)
+
+    def convert(self, content: str) -> str:
+        if not content:
+            return ""
+        if "<" not in content:
+            return content
+        return _MENTION_RE.sub(self, content)
+
+def discord_mentions_to_text(content: str, guild=None, resolver: Optional[MentionResolver] = None) -> str:
+    """Converte menções do Discord (<@>, <@&>, <#>, <t:>, emojis) em texto legível."""
+    return (resolver or MentionResolver(guild)).convert(content)
 
 # =========================
 # Helpers básicos
@@ -74,170 +109,289 @@ def guess_mime(url: str, fallback: str = "application/octet-stream") -> str:
     if u.endswith(".webp"): return "image/webp"
     return fallback
 
-# Markdown “lite” para título/descrição
+# =========================
+# Markdown do Discord — renderer de passada única
+# (código, negrito, itálico, sublinhado, tachado, spoiler, citação e links)
+# =========================
+_MD_SPECIAL = re.compile(r"[\\`*_~|\[\n]|https?://")
+_MD_LINK = re.compile(r"\[([^\[\]\n]{1,256})\]\((https?://[^\s()<>]{1,2048})\)")
+_MD_URL_END = re.compile(r"[\s<]")
+_MD_ESCAPABLE = frozenset("\\`*_~|[]()>#-")
+_MD_OPEN = {"**": "<strong>", "*": "<em>", "_": "<em>", "__": "<u>", "~~": "<s>", "||": '<span class="spoiler">'}
+_MD_CLOSE = {"**": "</strong>", "*": "</em>", "_": "</em>", "__": "</u>", "~~": "</s>", "||": "</span>"}
+
+_esc = html.escape  # sem o wrapper: md_lite chama isto a cada trecho de texto
+
+def _md_link(url: str, label: str) -> str:
+    return f'<a href="{escape(url)}" target="_blank" rel="noopener">{escape(label)}</a>'
+
 def md_lite(text: str) -> str:
+    """Markdown do Discord -> HTML em uma única varredura (tempo linear, um buffer de saída).
+    Delimitadores sem par viram texto literal."""
     if not text:
         return ""
-    t = escape(text)
-    # inline code
-    t = t.replace("`", "\uE001")
-    seg = t.split("\uE001")
-    for i in range(1, len(seg), 2):
-        seg[i] = f"<code>{seg[i]}</code>"
-    t = "".join(seg)
-    # bold
-    t = t.replace("**", "\uE002")
-    seg = t.split("\uE002")
-    for i in range(1, len(seg), 2):
-        seg[i] = f"<strong>{seg[i]}</strong>"
-    t = "".join(seg)
-    # italics
-    t = t.replace("*", "\uE003")
-    seg = t.split("\uE003")
-    for i in range(1, len(seg), 2):
-        seg[i] = f"<em>{seg[i]}</em>"
-    t = "".join(seg)
-    # underline
-    t = t.replace("__", "\uE004")
-    seg = t.split("\uE004")
-    for i in range(1, len(seg), 2):
-        seg[i] = f"<u>{seg[i]}</u>"
-    t = "".join(seg)
-    return t.replace("\n", "<br>")
+    out: List[str] = []
+    append = out.append
+    stack: List[tuple] = []        # (marcador, índice do placeholder em out)
+    opened: Dict[str, int] = {}    # marcador -> quantos abertos na pilha
+    n = len(text)
+    i = 0
+    line_start = True
+    in_quote = quote_rest = False
+    no_fence = no_tick = False     # sem fechamento adiante: não procura de novo
+
+    def push(mk: str):
+        stack.append((mk, len(out)))
+        opened[mk] = opened.get(mk, 0) + 1
+        append(mk)             # placeholder literal até achar o par
+
+    def close(mk: str):
+        # desempilha até o marcador; os de cima ficam como texto literal
+        while True:
+            top, idx = stack.pop()
+            opened[top] -= 1
+            if top == mk:
+                break
+        if idx == len(out) - 1:    # par vazio (ex.: "****") fica literal
+            append(mk)
+            return
+        out[idx] = _MD_OPEN[mk]
+        append(_MD_CLOSE[mk])
+
+    def reset():
+        stack.clear()
+        opened.clear()
+
+    while i < n:
+        # ----- início de linha: citações "> " e ">>> "
+        if line_start:
+            line_start = False
+            if not quote_rest:
+                if text.startswith(">>> ", i) or text.startswith("> ", i):
+                    if not in_quote:
+                        reset()
+                        append("<blockquote>")
+                        in_quote = True
+                    if text.startswith(">>> ", i):
+                        quote_rest = True
+                        i += 4
+                    else:
+                        i += 2
+                    continue
+                if in_quote:
+                    reset()
+                    append("</blockquote>")
+                    in_quote = False
+
+        c = text[i]
+
+        # ----- texto comum até o próximo caractere especial
+        if c not in "\\`*_~|[\nh":
+            m = _MD_SPECIAL.search(text, i)
+            j = m.start() if m else n
+            append(_esc(text[i:j]))
+            i = j
+            continue
+
+        if c == "\n":
+            i += 1
+            line_start = True
+            # a quebra que encerra a citação não vira <br>
+            if in_quote and not quote_rest and not (text.startswith("> ", i) or text.startswith(">>> ", i)):
+                continue
+            append("<br>")
+            continue
+
+        if c == "\\":
+            if i + 1 < n and text[i + 1] in _MD_ESCAPABLE:
+                append(_esc(text[i + 1]))
+                i += 2
+            else:
+                append("\\")
+                i += 1
+            continue
+
+        if c == "`":
+            if text.startswith("```", i) and not no_fence:
+                end = text.find("```", i + 3)
+                if end != -1:
+                    body = text[i + 3:end]
+                    first, nl, rest = body.partition("\n")
+                    if nl and first and " " not in first:
+                        body = rest    # linha da linguagem (```py)
+                    elif nl and not first:
+                        body = rest
+                    if body.endswith("\n"):
+                        body = body[:-1]
+                    append(f"<pre><code>{_esc(body)}</code></pre>")
+                    i = end + 3
+                    continue
+                no_fence = True
+            if not no_tick:
+                end = text.find("`", i + 1)
+                if end == -1:
+                    no_tick = True
+                elif end > i + 1:
+                    append(f"<code>{_esc(text[i + 1:end])}</code>")
+                    i = end + 1
+                    continue
+            append("`")
+            i += 1
+            continue
+
+        if c == "[":
+            m = _MD_LINK.match(text, i)
+            if m:
+                append(_md_link(m.group(2), m.group(1)))
+                i = m.end()
+            else:
+                append("[")
+                i += 1
+            continue
+
+        if c == "h":
+            if text.startswith(("http://", "https://"), i):
+                m = _MD_URL_END.search(text, i)
+                j = m.start() if m else n
+                while j > i and text[j - 1] in ".,;:!?)'\"":
+                    j -= 1
+                append(_md_link(text[i:j], text[i:j]))
+                i = j
+            else:
+                append("h")
+                i += 1
+            continue
+
+        # ----- delimitadores: * _ ~ |
+        j = i
+        while j < n and text[j] == c:
+            j += 1
+        run = j - i
+        prev = text[i - 1] if i > 0 else " "
+        nxt = text[j] if j < n else " "
+        i = j
+
+        if c in "~|":
+            mk = c * 2
+            for _ in range(run // 2):
+                if opened.get(mk):
+                    close(mk)
+                else:
+                    push(mk)
+            if run % 2:
+                append(_esc(c))
+            continue
+
+        if c == "*":
+            can_open, can_close = not nxt.isspace(), not prev.isspace()
+        else:  # "_" só vale fora de palavras (snake_case fica literal)
+            can_open, can_close = not prev.isalnum(), not nxt.isalnum()
+
+        double = c * 2
+        while run > 0:
+            top = stack[-1][0] if stack else None
+            if can_close and run >= 2 and top == double:
+                close(double); run -= 2
+            elif can_close and top == c:
+                close(c); run -= 1
+            elif can_close and run >= 2 and opened.get(double):
+                close(double); run -= 2
+            elif can_close and opened.get(c):
+                close(c); run -= 1
+            elif can_open:
+                mk = double if run >= 2 else c
+                push(mk); run -= len(mk)
+            else:
+                append(c * run); run = 0
+
+    if in_quote:
+        append("</blockquote>")
+    return "".join(out)
 
 # =========================
-# Baixar e embutir imagem em base64
+# Baixar e embutir imagem em base64 (via cache do processo)
 # =========================
-async def image_to_base64(url: str) -> str:
+async def image_to_base64(
+    url: str,
+    session: Optional[aiohttp.ClientSession] = None,
+    bounds: Optional[Tuple[int, int]] = None,
+) -> str:
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, timeout=30) as resp:
-                if resp.status == 200:
-                    data = await resp.read()
-                    mime = guess_mime(url, "image/png")
-                    encoded = base64.b64encode(data).decode("utf-8")
-                    return f"data:{mime};base64,{encoded}"
+        entry = await media_cache.fetch(url, session)
+        if entry is not None:
+            if bounds:
+                entry = await optimize(entry, bounds)  # reduz para o tamanho exibido (WebP/AVIF)
+            return media_cache.data_uri(entry)
     except Exception as e:
         log.warning(f"[img-b64] Falha ao embutir {url}: {e}")
     return url  # fallback
 
 # =========================
-# Gerador principal do HTML
+# Pré-busca concorrente das imagens do transcript
 # =========================
-async def generate_transcript_html(
-    channel_name: str,
-    messages: List[Dict],
-    header_img: str = "https://cdn.discordapp.com/embed/avatars/1.png"
-) -> str:
-    log.info(f"[transcript_html] Gerando transcript para canal: {channel_name}")
-    now = dt.datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+def collect_image_urls(messages: List[Dict], header_img: str = "") -> Dict[str, Tuple[int, int]]:
+    """Varre as mensagens uma vez e devolve as URLs de imagem únicas (em ordem),
+    cada uma com o maior tamanho em que aparece no transcript."""
+    seen: Dict[str, Tuple[int, int]] = {}
 
-    header_img_src = await image_to_base64(header_img) if is_image(header_img) else header_img
+    def add(url, bounds):
+        if not url or not is_image(url):
+            return
+        prev = seen.get(url)
+        seen[url] = bounds if prev is None else (max(prev[0], bounds[0]), max(prev[1], bounds[1]))
 
-    html_msgs = []
+    add(header_img, scaled(BOUNDS_HEADER))
     for m in messages:
-        author = escape(m.get("author", "Usuário"))
-        timestamp = escape(m.get("time", ""))
-        content_raw = m.get("content", "")
-        content_clean = discord_mentions_to_text(content_raw)
-        content_html = md_lite(content_clean)
-        avatar = m.get("avatar") or "https://cdn.discordapp.com/embed/avatars/0.png"
-        avatar_b64 = await image_to_base64(avatar) if is_image(avatar) else avatar
-        role_html = m.get("role_html", "")
-
-        # anexos
-        att_parts: List[str] = []
+        add(m.get("avatar") or "https://cdn.discordapp.com/embed/avatars/0.png", scaled(BOUNDS_AVATAR))
         for att in m.get("attachments", []):
-            if is_image(att):
-                att_src = await image_to_base64(att)
-                att_parts.append(f'<div class="att"><img src="{att_src}" alt="imagem" loading="lazy"/></div>')
-            elif is_video(att):
-                att_parts.append(
-                    f'<div class="att"><video controls playsinline preload="metadata">'
-                    f'<source src="{att}" type="video/mp4"></video></div>'
-                )
-            elif is_audio(att):
-                att_parts.append(f'<div class="att"><audio controls src="{att}"></audio></div>')
-            else:
-                name = escape(att.split("/")[-1])
-                att_parts.append(
-                    f'<div class="file-card"><div class="file-name">{name}</div>'
-                    f'<div class="file-btn"><a href="{att}" target="_blank" rel="noopener">Download</a></div></div>'
-                )
-        att_html = "".join(att_parts)
-
-        # embeds
-        emb_out: List[str] = []
+            add(att, scaled(BOUNDS_ATTACHMENT))
         for emb in m.get("embeds", []) or []:
-            color = emb.get("color") or "#5865F2"
-            title = md_lite(emb.get("title", "") or "")
-            desc = md_lite(emb.get("description", "") or "")
-            image = emb.get("image")
-            thumb = emb.get("thumbnail")
-            fields = emb.get("fields") or []
-            footer_text = emb.get("footer_text") or ""
-            footer_icon = emb.get("footer_icon")
-
-            emb_frag = [
-                f'<div class="embed" style="border-left:4px solid {color};background:#2f3136;'
-                f'border-radius:8px;padding:10px;margin-top:10px;">'
-            ]
-
-            if title:
-                emb_frag.append(f'<div class="emb-title">{title}</div>')
-            if desc:
-                emb_frag.append(f'<div class="emb-desc">{desc}</div>')
-
-            if fields:
-                emb_frag.append('<div class="emb-fields">')
-                for f in fields:
-                    name = md_lite(f.get("name", "") or "")
-                    value = md_lite(f.get("value", "") or "")
-                    inline = bool(f.get("inline"))
-                    style = "flex:1 1 calc(50% - 8px)" if inline else "flex:1 1 100%"
-                    emb_frag.append(
-                        f'<div class="emb-field" style="{style}">'
-                        f'<div class="f-name">{name}</div>'
-                        f'<div class="f-val">{value}</div>'
-                        '</div>'
-                    )
-                emb_frag.append('</div>')
-
-            if thumb:
-                emb_frag.append(f'<img src="{thumb}" alt="thumb" class="emb-thumb">')
-            if image and is_image(image):
-                img_src = await image_to_base64(image)
-                emb_frag.append(f'<img src="{img_src}" alt="embed image" class="emb-image">')
-
-            if footer_text or footer_icon:
-                footer_icon_html = ""
-                if footer_icon and is_image(footer_icon):
-                    footer_icon_html = f'<img src="{footer_icon}" class="footer-icon">'
-                emb_frag.append(f'<div class="emb-footer">{footer_icon_html}{footer_text}</div>')
+            add(emb.get("image"), scaled(BOUNDS_EMBED))
+    return seen
 
-            emb_frag.append('</div>')
-            emb_out.append("".join(emb_frag))
-
-        emb_html = "".join(emb_out)
-
-        html_msgs.append(f"""
-        <div class="msg">
-            <div class="avatar"><img src="{avatar_b64}" alt="avatar"></div>
-            <div class="msg-body">
-                <div class="msg-header">
-                    <span class="author">{author}</span>
-                    {role_html or ""}
-                    <span class="timestamp">{timestamp}</span>
-                </div>
-                {f'<div class="text">{content_html}</div>' if content_html else ''}
-                {emb_html}
-                {att_html}
-            </div>
-        </div>
-        """.strip())
+async def prefetch_images(
+    urls: Iterable[str],
+    *,
+    concurrency: int = FETCH_CONCURRENCY,
+    per_host: int = FETCH_PER_HOST,
+    deadline: float = FETCH_DEADLINE,
+    session: Optional[aiohttp.ClientSession] = None,
+) -> Dict[str, str]:
+    """Baixa as imagens em paralelo (limite global + por host + prazo total).
+    `urls` vindo de collect_image_urls traz os limites de exibição: a imagem é reduzida antes de embutir.
+    Retorna {url: data URI}; URLs que falharem/estourarem o prazo ficam de fora."""
+    bounds = urls if isinstance(urls, dict) else {}
+    urls = list(urls)
+    if not urls:
+        return {}
+
+    sem = asyncio.Semaphore(max(1, concurrency))
+    host_sems: Dict[str, asyncio.Semaphore] = {}
+    out: Dict[str, str] = {}
 
-    # CSS — incluindo limite de tamanho para imagens e vídeos
-    css = """
+    async def one(url: str):
+        host = urlsplit(url).netloc.lower()
+        hsem = host_sems.setdefault(host, asyncio.Semaphore(max(1, per_host)))
+        async with sem, hsem:
+            src = await image_to_base64(url, session, bounds.get(url))
+        if src != url:
+            out[url] = src
+
+    tasks = [asyncio.create_task(one(u)) for u in urls]
+    done, pending = await asyncio.wait(tasks, timeout=deadline if deadline > 0 else None)
+    for t in pending:
+        t.cancel()
+    if pending:
+        log.warning(f"[prefetch] Prazo de {deadline}s estourado — {len(pending)} imagens mantêm a URL original")
+        await asyncio.gather(*pending, return_exceptions=True)
+    log.info(f"[prefetch] {len(out)}/{len(urls)} imagens embutidas")
+    return out
+
+# =========================
+# Blocos do HTML (cabeçalho, mensagem, rodapé)
+# =========================
+# CSS — incluindo limite de tamanho para imagens e vídeos
+_CSS = """
     :root {
       --bg:#2b2d31; --panel:#23272a; --card:#313338; --chip:#2f3136;
       --muted:#b5bac1; --text:#dbdee1; --title:#fff; --accent:#5865F2; --line:#202225;
@@ -253,14 +407,22 @@ async def generate_transcript_html(
     .chatlog{width:92%;max-width:980px;margin:26px auto;display:flex;flex-direction:column;gap:14px}
     .msg{display:flex;gap:12px;background:var(--card);border:1px solid #2b2d31;border-radius:12px;
          padding:12px 14px;box-shadow:0 6px 22px rgba(0,0,0,.25)}
-    .avatar img{width:42px;height:42px;border-radius:50%;border:2px solid var(--line);object-fit:cover}
+    .avatar img, .avatar .av{width:42px;height:42px;border-radius:50%;border:2px solid var(--line);object-fit:cover}
+    .avatar .av{background:var(--chip) center/cover no-repeat}
     .msg-body{flex:1;min-width:0}
     .msg-header{display:flex;align-items:center;gap:10px;justify-content:space-between;flex-wrap:wrap}
     .author{font-weight:700;color:#e6e6e6}
     .timestamp{color:var(--muted);font-size:.9em}
-    .role{display:inline-block;font-size:12px;padding:2px 6px;border-radius:6px;background:transparent;margin-left:6px}
+    .role{display:inline-block;font-size:12px;font-weight:600;padding:2px 6px;border-radius:5px;
+          border:1px solid transparent;background:transparent;margin-left:6px}
     .text{margin-top:6px;white-space:normal;word-break:break-word;overflow-wrap:anywhere}
     .text code{background:#1f2124;border:1px solid #2a2d31;padding:2px 5px;border-radius:4px}
+.text pre, .emb-desc pre{background:#1f2124;border:1px solid #2a2d31;padding:8px;border-radius:4px;
+         white-space:pre-wrap;overflow-x:auto;margin:6px 0}
+    blockquote{margin:4px 0;padding:0 0 0 10px;border-left:4px solid #4e5058}
+    .spoiler{background:#1e1f22;color:transparent;border-radius:3px;padding:0 2px;cursor:pointer}
+    .spoiler:hover{color:inherit;background:#3a3c42}
+    .msg a{color:#00a8fc;text-decoration:none}
     .embed{margin-top:8px;background:var(--chip);border:1px solid #2a2d31;border-left:4px solid var(--accent);
            border-radius:8px;padding:10px}
     .emb-title{color:#fff;font-weight:700;margin-bottom:4px}
@@ -284,13 +446,26 @@ async def generate_transcript_html(
     footer{text-align:center;color:var(--muted);font-size:12px;padding:20px}
     """
 
-    html_final = f"""<!DOCTYPE html>
+def _role_css(messages: List[Dict]) -> str:
+    """Uma regra CSS por cargo distinto (em vez de estilo inline em cada mensagem)."""
+    rules: Dict[int, str] = {}
+    for m in messages:
+        role = m.get("role")
+        if role and role.get("id") not in rules:
+            color = role.get("color") or "#b9bbbe"
+            rules[role["id"]] = (
+                f".role-{int(role['id'])}{{color:{color};background-color:{color}22;border-color:{color}55}}"
+            )
+    return "\n".join(rules.values())
+
+def _render_head(channel_name: str, header_img_src: str, now: str, extra_css: str = "") -> str:
+    return f"""<!DOCTYPE html>
 <html lang="pt-BR">
 <head>
 <meta charset="UTF-8" />
 <title>Transcript — {escape(channel_name)}</title>
 <meta name="viewport" content="width=device-width,initial-scale=1" />
-<style>{css}</style>
+<style>{_CSS}{extra_css}</style>
 </head>
 <body>
 <header>
@@ -299,9 +474,267 @@ async def generate_transcript_html(
   <p>Gerado em {now}</p>
 </header>
 <div class="chatlog">
-{''.join(html_msgs)}
+"""
+
+_FOOT = """
 </div>
 <footer>© 2025 Vhe Code — Sistema de Transcripts Automático</footer>
 </body>
 </html>"""
-    return html_final
+
+class _AssetTable:
+    """Cada imagem embutida (data URI) entra uma única vez no HTML; as mensagens
+    referenciam por ID — avatares via classe CSS, imagens via tabela JS."""
+
+    def __init__(self):
+        self._ids: Dict[str, str] = {}
+        self._bg: Dict[str, str] = {}   # id -> src usado como background (avatar)
+        self._img: Dict[str, str] = {}  # id -> src usado em <img>
+
+    def _id(self, src: str) -> str:
+        aid = self._ids.get(src)
+        if aid is None:
+            aid = self._ids[src] = f"a{len(self._ids)}"
+        return aid
+
+    def avatar(self, src: str) -> str:
+        if not src.startswith("data:"):
+            return f'<img src="{escape(src)}" alt="avatar" loading="lazy">'
+        aid = self._id(src)
+        self._bg[aid] = src
+        return f'<div class="av {aid}" role="img" aria-label="avatar"></div>'
+
+    def img(self, src: str, attrs: str) -> str:
+        if not src.startswith("data:"):
+            if "loading=" not in attrs:
+                attrs += ' loading="lazy"'
+            return f'<img src="{escape(src)}" {attrs}>'
+        aid = self._id(src)
+        self._img[aid] = src
+        return f'<img data-a="{aid}" {attrs}>'
+
+    def render(self) -> str:
+        parts: List[str] = []
+        if self._bg:
+            rules = "\n".join(f'.{aid}{{background-image:url("{src}")}}' for aid, src in self._bg.items())
+            parts.append(f"<style>\n{rules}\n</style>")
+        if self._img:
+            table = json.dumps(self._img, separators=(",", ":")).replace("</", "<\\/")
+            parts.append(
+                f"<script>(function(){{var A={table};"
+                "document.querySelectorAll('img[data-a]').forEach(function(i){i.src=A[i.dataset.a];});"
+                "}})();</script>"
+            )
+        return "\n".join(parts)
+
+def _render_message(m: Dict, srcs: Dict[str, str], assets: _AssetTable) -> str:
+    author = escape(m.get("author", "Usuário"))
+    timestamp = escape(m.get("time", ""))
+    # menções já foram resolvidas na coleta (collect_message / captura ao vivo)
+    content_html = md_lite(m.get("content", ""))
+    avatar = m.get("avatar") or "https://cdn.discordapp.com/embed/avatars/0.png"
+    avatar_html = assets.avatar(srcs.get(avatar, avatar))
+    role = m.get("role")
+    role_html = f'<span class="role role-{int(role["id"])}">{escape(role.get("name", ""))}</span>' if role else ""
+
+    # anexos
+    att_parts: List[str] = []
+    for att in m.get("attachments", []):
+        if is_image(att):
+            att_img = assets.img(srcs.get(att, att), 'alt="imagem" loading="lazy"')
+            att_parts.append(f'<div class="att">{att_img}</div>')
+        elif is_video(att):
+            att_parts.append(
+                f'<div class="att"><video controls playsinline preload="metadata">'
+                f'<source src="{att}" type="video/mp4"></video></div>'
+            )
+        elif is_audio(att):
+            att_parts.append(f'<div class="att"><audio controls src="{att}"></audio></div>')
+        else:
+            name = escape(att.split("/")[-1])
+            att_parts.append(
+                f'<div class="file-card"><div class="file-name">{name}</div>'
+                f'<div class="file-btn"><a href="{att}" target="_blank" rel="noopener">Download</a></div></div>'
+            )
+    att_html = "".join(att_parts)
+
+    # embeds
+    emb_out: List[str] = []
+    for emb in m.get("embeds", []) or []:
+        color = emb.get("color") or "#5865F2"
+        title = md_lite(emb.get("title", "") or "")
+        desc = md_lite(emb.get("description", "") or "")
+        image = emb.get("image")
+        thumb = emb.get("thumbnail")
+        fields = emb.get("fields") or []
+        footer_text = emb.get("footer_text") or ""
+        footer_icon = emb.get("footer_icon")
+
+        emb_frag = [
+            f'<div class="embed" style="border-left:4px solid {color};background:#2f3136;'
+            f'border-radius:8px;padding:10px;margin-top:10px;">'
+        ]
+
+        if title:
+            emb_frag.append(f'<div class="emb-title">{title}</div>')
+        if desc:
+            emb_frag.append(f'<div class="emb-desc">{desc}</div>')
+
+        if fields:
+            emb_frag.append('<div class="emb-fields">')
+            for f in fields:
+                name = md_lite(f.get("name", "") or "")
+                value = md_lite(f.get("value", "") or "")
+                inline = bool(f.get("inline"))
+                style = "flex:1 1 calc(50% - 8px)" if inline else "flex:1 1 100%"
+                emb_frag.append(
+                    f'<div class="emb-field" style="{style}">'
+                    f'<div class="f-name">{name}</div>'
+                    f'<div class="f-val">{value}</div>'
+                    '</div>'
+                )
+            emb_frag.append('</div>')
+
+        if thumb:
+            emb_frag.append(f'<img src="{thumb}" alt="thumb" class="emb-thumb">')
+        if image and is_image(image):
+            emb_frag.append(assets.img(srcs.get(image, image), 'alt="embed image" class="emb-image"'))
+
+        if footer_text or footer_icon:
+            footer_icon_html = ""
+            if footer_icon and is_image(footer_icon):
+                footer_icon_html = f'<img src="{footer_icon}" class="footer-icon">'
+            emb_frag.append(f'<div class="emb-footer">{footer_icon_html}{footer_text}</div>')
+
+        emb_frag.append('</div>')
+        emb_out.append("".join(emb_frag))
+
+    emb_html = "".join(emb_out)
+
+    return f"""
+    <div class="msg">
+        <div class="avatar">{avatar_html}</div>
+        <div class="msg-body">
+            <div class="msg-header">
+                <span class="author">{author}</span>
+                {role_html}
+                <span class="timestamp">{timestamp}</span>
+            </div>
+            {f'<div class="text">{content_html}</div>' if content_html else ''}
+            {emb_html}
+            {att_html}
+        </div>
+    </div>
+    """.strip()
+
+# =========================
+# Gerador principal do HTML (streaming)
+# =========================
+async def iter_transcript_html(
+    channel_name: str,
+    messages: List[Dict],
+    header_img: str = "https://cdn.discordapp.com/embed/avatars/1.png",
+    session: Optional[aiohttp.ClientSession] = None,
+    srcs: Optional[Dict[str, str]] = None,
+) -> AsyncIterator[str]:
+    """Produz o HTML em pedaços: cabeçalho, um bloco por mensagem e rodapé.
+    `srcs` ({url: data URI}) já pronto pula a pré-busca (etapa inline do pipeline)."""
+    log.info(f"[transcript_html] Gerando transcript para canal: {channel_name}")
+    now = dt.datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+
+    # 1) pré-busca: todas as imagens de uma vez, o render só consulta o mapa
+    if srcs is None:
+        srcs = await prefetch_images(collect_image_urls(messages, header_img), session=session)
+    header_img_src = srcs.get(header_img, header_img)
+
+    assets = _AssetTable()
+    yield _render_head(channel_name, header_img_src, now, _role_css(messages))
+    for i, m in enumerate(messages, 1):
+        yield _render_message(m, srcs, assets)
+        if i % 200 == 0:
+            await asyncio.sleep(0)  # devolve o loop em transcripts longos
+    # tabela de imagens (cada data URI uma vez), depois o rodapé
+    yield assets.render()
+    yield _FOOT
+
+async def write_transcript_html(
+    fp: BinaryIO,
+    channel_name: str,
+    messages: List[Dict],
+    header_img: str = "https://cdn.discordapp.com/embed/avatars/1.png",
+    session: Optional[aiohttp.ClientSession] = None,
+    srcs: Optional[Dict[str, str]] = None,
+) -> int:
+    """Escreve o transcript direto num arquivo binário, bloco a bloco. Retorna os bytes escritos."""
+    total = 0
+    async for chunk in iter_transcript_html(channel_name, messages, header_img, session, srcs):
+        total += fp.write(chunk.encode("utf-8"))
+    return total
+
+async def generate_transcript_html(
+    channel_name: str,
+    messages: List[Dict],
+    header_img: str = "https://cdn.discordapp.com/embed/avatars/1.png",
+    session: Optional[aiohttp.ClientSession] = None,
+) -> str:
+    """Versão em memória (string única) — prefira write_transcript_html para tickets longos."""
+    parts = [chunk async for chunk in iter_transcript_html(channel_name, messages, header_img, session)]
+    return "".join(parts)
+
+# =========================
+# Visualizador paginado (tickets muito longos)
+# =========================
+# mensagens pré-renderizadas em páginas JSON; o shell traz só a 1ª página e busca o resto ao rolar.
+# páginas longe da tela viram um placeholder com a altura medida (o DOM fica pequeno).
+_VIEWER_CSS = """
+    .page{display:flex;flex-direction:column;gap:14px}
+    #more{text-align:center;color:var(--muted);font-size:13px;padding:12px}
+    """
+
+_VIEWER_JS = """<script>(function(){
+var N=%(pages)d,BASE=%(base)s,log=document.getElementById('pages'),more=document.getElementById('more'),
+next=1,busy=false,cache={};
+function pad(n){return ('000'+n).slice(-4);}
+var vis=new IntersectionObserver(function(es){es.forEach(function(e){var s=e.target,n=s.dataset.n;
+ if(e.isIntersecting){if(s.dataset.h){s.innerHTML=cache[n];s.style.height='';delete s.dataset.h;delete cache[n];}}
+ else if(!s.dataset.h){cache[n]=s.innerHTML;s.style.height=s.offsetHeight+'px';s.dataset.h='1';s.innerHTML='';}
+});},{rootMargin:'2500px 0px'});
+function add(n,msgs){var s=document.createElement('section');s.className='page';s.dataset.n=n;
+ s.innerHTML=msgs.join('');log.appendChild(s);vis.observe(s);}
+function load(){if(busy||next>=N)return;busy=true;var n=next++;
+ fetch(BASE+pad(n)+'.json').then(function(r){return r.json();}).then(function(p){add(n,p.messages);})
+ .then(function(){busy=false;if(next>=N)more.remove();else if(near)load();},
+  function(){more.textContent='Falha ao carregar a página '+(n+1)+' — role novamente para tentar.';next=n;
+   setTimeout(function(){busy=false;},3000);});}
+var near=false;
+new IntersectionObserver(function(es){near=es[0].isIntersecting;if(near)load();},{rootMargin:'1500px 0px'}).observe(more);
+log.querySelectorAll('.page').forEach(function(s){vis.observe(s);});
+if(N<=1)more.remove();
+})();</script>"""
+
+
+def render_pages(messages: List[Dict], page_size: int) -> Iterable[List[str]]:
+    """Mensagens pré-renderizadas em páginas de `page_size`, com imagens por URL (lazy, sem base64)."""
+    page_size = max(1, page_size)
+    assets = _AssetTable()
+    for start in range(0, len(messages), page_size):
+        yield [_render_message(m, {}, assets) for m in messages[start:start + page_size]]
+
+
+def render_viewer_shell(
+    channel_name: str,
+    messages: List[Dict],
+    first_page: List[str],
+    pages: int,
+    page_base: str,
+    header_img: str = "https://cdn.discordapp.com/embed/avatars/1.png",
+) -> str:
+    """Página leve: cabeçalho + 1ª página inline (primeira pintura sem esperar rede) + JS do scroll."""
+    now = dt.datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+    head = _render_head(channel_name, escape(header_img), now, _VIEWER_CSS + _role_css(messages))
+    body = (
+        f'<div id="pages"><section class="page" data-n="0">{"".join(first_page)}</section></div>'
+        f'<div id="more">Carregando mais mensagens… ({len(messages)} no total)</div>'
+    )
+    js = _VIEWER_JS % {"pages": pages, "base": json.dumps(page_base).replace("</", "<\\/")}
+    return head + body + js + _FOOT
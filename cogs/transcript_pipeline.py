@@ -0,0 +1,427 @@
+# cogs/transcript_pipeline.py
+# Pipeline único de transcript: coleta → mirror → inline → render → upload
+# usado pelo fechamento de tickets e pelo /testetranscript
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import tempfile
+from dataclasses import dataclass, field, asdict
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import aiohttp
+import discord
+
+from utils import env
+from utils.ftp_uploader import upload_to_hostgator, remote_exists
+from utils.asset_index import asset_index, VERIFY_REMOTE
+from utils.image_optimizer import BOUNDS_ATTACHMENT, BOUNDS_HEADER, IMAGE_FORMAT, optimize, scaled
+from utils.media_cache import MediaEntry, media_cache, normalize_url
+from cogs.transcript_html_core import (
+    MentionResolver,
+    collect_image_urls,
+    discord_mentions_to_text,
+    is_image,
+    prefetch_images,
+)
+from cogs.transcript_formats import TranscriptContext, OutputFile, needs_mirror, render_outputs, resolve_formats
+
+log = logging.getLogger("transcript_pipeline")
+
+DEFAULT_AVATAR = "https://cdn.discordapp.com/embed/avatars/0.png"
+DEFAULT_HEADER = "https://cdn.discordapp.com/embed/avatars/1.png"
+MIRROR_CONCURRENCY: int = env.get_int("TRANSCRIPT_MIRROR_CONCURRENCY", 4)
+
+
+# =========================
+# Modelo
+# =========================
+@dataclass(slots=True)
+class TranscriptMessage:
+    """Uma mensagem do transcript (formato compacto; vira dict só no render/JSON)."""
+    time: str
+    author: str
+    content: str = ""
+    attachments: List[str] = field(default_factory=list)
+    embeds: List[Dict] = field(default_factory=list)
+    avatar: str = DEFAULT_AVATAR
+    role: Optional[Dict] = None
+    id: int = 0
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, d: Dict) -> "TranscriptMessage":
+        return cls(
+            time=d.get("time", ""),
+            author=d.get("author", "Usuário"),
+            content=d.get("content") or "",
+            attachments=list(d.get("attachments") or []),
+            embeds=list(d.get("embeds") or []),
+            avatar=d.get("avatar") or DEFAULT_AVATAR,
+            role=d.get("role"),
+            id=int(d.get("id") or 0),
+        )
+
+
+# =========================
+# Coleta
+# =========================
+def embed_data(d: Dict) -> Dict:
+    """Embed (formato dict da API) -> dicionário usado pelo transcript."""
+    fields = [
+        {"name": f.get("name") or "", "value": f.get("value") or "", "inline": bool(f.get("inline"))}
+        for f in d.get("fields", []) or []
+    ]
+    return {
+        "title": d.get("title"),
+        "description": d.get("description"),
+        "color": f"#{d.get('color'):06x}" if d.get("color") else "#5865F2",
+        "image": (d.get("image") or {}).get("url"),
+        "thumbnail": (d.get("thumbnail") or {}).get("url"),
+        "fields": fields,
+        "footer_text": (d.get("footer") or {}).get("text"),
+        "footer_icon": (d.get("footer") or {}).get("icon_url"),
+    }
+
+
+class AuthorProfiles:
+    """Memo por transcript: nome, avatar e cargo de cada autor calculados uma única vez."""
+
+    def __init__(self):
+        self._by_id: Dict[int, Dict] = {}
+
+    def get(self, author: discord.abc.User) -> Dict:
+        prof = self._by_id.get(author.id)
+        if prof is not None:
+            return prof
+
+        # ===== CARGO VISUAL (vira classe CSS no render) =====
+        role = None
+        if isinstance(author, discord.Member):
+            roles = [r for r in author.roles if r.name != "@everyone"]
+            if roles:
+                top_role = max(roles, key=lambda r: r.position)
+                role = {
+                    "id": top_role.id,
+                    "name": top_role.name,
+                    "color": f"#{top_role.color.value:06x}" if top_role.color.value != 0 else "#b9bbbe",
+                }
+
+        avatar_url = str(author.display_avatar.url) if getattr(author, "display_avatar", None) else DEFAULT_AVATAR
+        prof = {
+            "author": str(getattr(author, "display_name", getattr(author, "name", "Usuário"))),
+            "avatar": avatar_url,
+            "role": role,
+        }
+        self._by_id[author.id] = prof
+        return prof
+
+
+def collect_message(
+    msg: discord.Message,
+    guild: Optional[discord.Guild],
+    resolver: Optional[MentionResolver] = None,
+    profiles: Optional[AuthorProfiles] = None,
+) -> Optional[TranscriptMessage]:
+    """Converte uma mensagem do Discord no modelo do transcript (None = mensagem vazia de bot)."""
+    if msg.author.bot and not msg.content and not msg.embeds and not msg.attachments:
+        return None
+
+    prof = (profiles or AuthorProfiles()).get(msg.author)
+    return TranscriptMessage(
+        time=msg.created_at.strftime("%d/%m/%Y %H:%M:%S"),
+        author=prof["author"],
+        content=discord_mentions_to_text(msg.content or "", guild, resolver),
+        attachments=[a.url for a in msg.attachments],
+        embeds=[embed_data(emb.to_dict()) for emb in msg.embeds],
+        avatar=prof["avatar"],
+        role=prof["role"],
+        id=msg.id,
+    )
+
+
+async def collect_history(
+    ch: discord.TextChannel,
+    capture=None,
+    on_message: Optional[Callable[[TranscriptMessage], None]] = None,
+) -> List[TranscriptMessage]:
+    """Mensagens do canal em ordem. Com captura ao vivo (utils.ticket_capture), lê a base
+    local e só busca via REST o que veio antes/depois do trecho capturado e as lacunas
+    em que o bot esteve fora (dentro delas o REST é a versão válida: edições e exclusões).
+    `on_message` recebe cada mensagem assim que coletada (ex.: dispara o mirror)."""
+    guild = ch.guild
+    resolver = MentionResolver(guild)  # nomes resolvidos uma vez por transcript
+    profiles = AuthorProfiles()        # autor/avatar/cargo uma vez por autor
+
+    async def page(**kwargs) -> List[TranscriptMessage]:
+        out = []
+        async for msg in ch.history(limit=None, oldest_first=True, **kwargs):
+            data = collect_message(msg, guild, resolver, profiles)
+            if data:
+                out.append(data)
+                if on_message:
+                    on_message(data)
+        return out
+
+    if capture is None:
+        return await page()
+
+    captured_raw, first_id, last_id = capture.load(ch.id)
+    captured = [TranscriptMessage.from_dict(d) for d in captured_raw]
+    gap_msgs: List[TranscriptMessage] = []
+    if first_id is not None:
+        for start, end in capture.gaps_for(first_id, last_id):
+            # só o miolo: antes de first_id e depois de last_id já são buscados abaixo
+            start, end = max(start, first_id - 1), min(end, last_id + 1)
+            # bot fora do ar: o que a captura tem nesse trecho é substituído pelo estado atual
+            captured = [m for m in captured if not start < m.id < end]
+            gap_msgs += await page(after=discord.Object(id=start), before=discord.Object(id=end))
+        if gap_msgs:
+            captured = sorted({m.id: m for m in captured + gap_msgs}.values(), key=lambda m: m.id)
+    if on_message:
+        gap_ids = {m.id for m in gap_msgs}  # essas já passaram pelo on_message dentro de page()
+        for m in captured:
+            if m.id not in gap_ids:
+                on_message(m)
+    before: List[TranscriptMessage] = []
+    if first_id is not None:
+        # ticket capturado desde a abertura: esta página volta vazia
+        before = await page(before=discord.Object(id=first_id))
+    after = await page(after=discord.Object(id=last_id) if last_id else None)
+    log.info(
+        f"📼 Transcript de '{ch.name}': {len(captured) - len(gap_msgs)} msgs da captura local, "
+        f"{len(before) + len(gap_msgs) + len(after)} via REST"
+    )
+    return before + captured + after
+
+
+# =========================
+# Etapa: mirror (anexos de imagem → HostGator)
+# =========================
+def _mirror_name(url: str) -> str:
+    """Nome remoto estável: att_<id>_<arquivo> (anexos) ou guild_<id>_<hash> (ícones).
+    IDs/hashes do Discord não se repetem, então nome existente = mesmo conteúdo."""
+    parts = [p for p in urlsplit(url).path.split("/") if p]
+    if len(parts) >= 4 and parts[0] == "attachments":
+        return f"att_{parts[2]}_{parts[3]}"
+    if len(parts) >= 3 and parts[0] == "icons":
+        return f"guild_{parts[1]}_{parts[2]}"
+    return f"att_{parts[-1]}" if parts else "att_arquivo.png"
+
+
+def _optimized_name(name: str) -> str:
+    return f"{os.path.splitext(name)[0]}.{IMAGE_FORMAT}"
+
+
+def _remote_candidates(name: str) -> List[str]:
+    """Nome otimizado primeiro (caso comum), depois o original (imagem que não compensou reduzir)."""
+    optimized = _optimized_name(name)
+    return [optimized, name] if optimized != name else [name]
+
+
+def _remote_file(public_url: str) -> str:
+    """Nome do arquivo no servidor a partir da URL pública (ftp_uploader não codifica o nome)."""
+    return os.path.basename(urlsplit(public_url).path)
+
+
+class AttachmentMirror:
+    """Espelhamento concorrente (limite MIRROR_CONCURRENCY) que roda junto com a paginação.
+    Deduplica por nome remoto (ID do anexo) e por hash do conteúdo; consulta o índice
+    local (utils.asset_index) antes de baixar/enviar e pula o que já está no servidor."""
+
+    def __init__(self, session: Optional[aiohttp.ClientSession] = None, concurrency: int = MIRROR_CONCURRENCY):
+        self.session = session
+        self._sem = asyncio.Semaphore(max(1, concurrency))
+        self._tasks: Dict[str, asyncio.Task] = {}          # nome remoto -> task (URL pública)
+        self._by_hash: Dict[str, asyncio.Future] = {}      # sha256 -> URL pública
+        self.skipped = 0
+
+    def submit(self, url: str, bounds: Tuple[int, int] = BOUNDS_ATTACHMENT) -> str:
+        name = _mirror_name(url)
+        if name not in self._tasks:
+            self._tasks[name] = asyncio.create_task(self._mirror(url, name, bounds))
+        return name
+
+    def submit_message(self, m: TranscriptMessage):
+        for att in m.attachments:
+            if is_image(att):
+                self.submit(att)
+
+    async def _mirror(self, url: str, name: str, bounds: Tuple[int, int]) -> str:
+        async with self._sem:
+            # nomes em que o arquivo pode estar no servidor: otimizado (.webp/.avif) ou original
+            names = _remote_candidates(name)
+            # 1) índice local: zero rede (ou só um MLST/SIZE com ASSET_INDEX_VERIFY=1)
+            for key in names:
+                known = asset_index.url_for_name(key)
+                if not known:
+                    continue
+                # confere o arquivo para onde a URL aponta (alias de hash aponta para outro nome)
+                if not VERIFY_REMOTE or await remote_exists(_remote_file(known)):
+                    self.skipped += 1
+                    return known
+                asset_index.forget(key)  # sumiu do servidor: envia de novo
+            if VERIFY_REMOTE:
+                # 2) fora do índice (ex.: enviado antes do índice existir): pergunta ao servidor;
+                # só com ASSET_INDEX_VERIFY=1 — com o índice frio seria um STAT por anexo
+                for key in names:
+                    existing = await remote_exists(key)
+                    if existing:
+                        asset_index.record(_remote_file(existing), existing, source_url=normalize_url(url))
+                        self.skipped += 1
+                        return existing
+
+            entry = await media_cache.fetch(url, self.session)
+            if entry is None:
+                return url
+
+            # 3) mesmo conteúdo com outro ID (ex.: imagem reenviada): reaproveita o upload
+            prior = self._by_hash.get(entry.digest)
+            if prior is not None:
+                new_url = await asyncio.shield(prior)
+            else:
+                fut = asyncio.get_running_loop().create_future()
+                self._by_hash[entry.digest] = fut
+                new_url = url
+                try:
+                    new_url = asset_index.url_for_digest(entry.digest) or await self._upload(entry, name, bounds) or url
+                finally:
+                    fut.set_result(new_url)
+            if new_url != url:
+                # enviado agora: chave = nome real no servidor; reaproveitado por hash: alias pelo nome deste anexo
+                uploaded = _remote_file(new_url)
+                asset_index.record(
+                    uploaded if uploaded in names else name, new_url,
+                    source_url=normalize_url(url), digest=entry.digest, size=len(entry.data),
+                )
+                if await media_cache.get(new_url) is None:
+                    media_cache.alias(new_url, entry)  # o inline reaproveita os bytes, sem baixar de novo
+            return new_url
+
+    async def _upload(self, entry: MediaEntry, name: str, bounds: Tuple[int, int]) -> Optional[str]:
+        # reduzida para o tamanho exibido (quando compensa) e enviada direto da memória, sem arquivo temporário
+        stored = await optimize(entry, scaled(bounds))
+        if stored is not entry:
+            name = _optimized_name(name)
+        new_url = await upload_to_hostgator(memoryview(stored.data), name)
+        if new_url:
+            media_cache.alias(new_url, stored)
+        return new_url
+
+    async def url_for(self, url: str) -> str:
+        task = self._tasks.get(_mirror_name(url))
+        if task is None:
+            return url
+        try:
+            return await task
+        except Exception as e:
+            log.warning(f"Mirror falhou para {url}: {e}")
+            return url
+
+    async def apply(self, messages: List[TranscriptMessage]):
+        """Espera os uploads pendentes e reescreve as URLs das mensagens."""
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        for m in messages:
+            if m.attachments:
+                m.attachments = [await self.url_for(att) if is_image(att) else att for att in m.attachments]
+        log.info(f"[mirror] {len(self._tasks)} anexo(s) espelhado(s), {self.skipped} reaproveitado(s) sem transferência")
+
+
+async def mirror_stage(
+    messages: List[TranscriptMessage],
+    header_img: str,
+    session: Optional[aiohttp.ClientSession] = None,
+    mirror: Optional[AttachmentMirror] = None,
+) -> str:
+    """Espelha imagens anexadas (URLs do CDN expiram) e reescreve as mensagens.
+    Com um `mirror` já alimentado durante a coleta, só espera o que falta.
+    Retorna o header (ícone da guild) também espelhado."""
+    mirror = mirror or AttachmentMirror(session)
+    for m in messages:
+        mirror.submit_message(m)  # já enviados são ignorados (dedupe por nome)
+    if header_img and header_img != DEFAULT_HEADER:
+        mirror.submit(header_img, BOUNDS_HEADER)
+    await mirror.apply(messages)
+    return await mirror.url_for(header_img)
+
+
+# =========================
+# Etapas: inline → render → upload
+# =========================
+async def inline_stage(
+    messages: List[Dict], header_img: str, session: Optional[aiohttp.ClientSession] = None
+) -> Dict[str, str]:
+    """Baixa/embute as imagens uma vez ({url: data URI}); todos os formatos reaproveitam."""
+    return await prefetch_images(collect_image_urls(messages, header_img), session=session)
+
+
+async def render_stage(
+    channel_name: str,
+    messages: List[TranscriptMessage],
+    header_img: str,
+    local_base: str,
+    remote_base: str,
+    formats: List[str],
+    session: Optional[aiohttp.ClientSession] = None,
+) -> List[OutputFile]:
+    dicts = [m.to_dict() for m in messages]
+    formats = resolve_formats(formats, len(dicts))
+    # só os formatos HTML de página única embutem imagens
+    needs_inline = any(f.startswith("html") for f in formats)
+    srcs = await inline_stage(dicts, header_img, session) if needs_inline else {}
+    ctx = TranscriptContext(
+        channel_name=channel_name,
+        messages=dicts,
+        header_img=header_img,
+        local_base=local_base,
+        remote_base=remote_base,
+        session=session,
+        srcs=srcs,
+    )
+    return await render_outputs(ctx, formats)
+
+
+async def upload_stage(outputs: List[List[str]]) -> str:
+    """Sobe [caminho, nome remoto, url] que ainda não têm URL; retorna o link principal."""
+    for out in outputs:
+        if not out[2]:
+            out[2] = await upload_to_hostgator(out[0], out[1]) or ""
+    return next((o[2] for o in outputs if o[2]), "")
+
+
+# =========================
+# Execução completa (uso avulso, ex.: /testetranscript)
+# =========================
+async def run_transcript(
+    ch: discord.TextChannel,
+    remote_base: str,
+    formats: List[str],
+    *,
+    mirror: bool = True,
+    session: Optional[aiohttp.ClientSession] = None,
+) -> Tuple[str, List[List[str]]]:
+    """Coleta, espelha, renderiza e envia. Retorna (link principal, saídas)."""
+    log.info(f"Gerando transcript de {ch.name} ({ch.id})...")
+    header_img = str(ch.guild.icon.url) if ch.guild and ch.guild.icon else DEFAULT_HEADER
+    if mirror or needs_mirror(formats):
+        # anexos sobem enquanto o histórico ainda está sendo paginado
+        mirrors = AttachmentMirror(session)
+        messages = await collect_history(ch, on_message=mirrors.submit_message)
+        header_img = await mirror_stage(messages, header_img, session, mirrors)
+    else:
+        messages = await collect_history(ch)
+
+    with tempfile.TemporaryDirectory(prefix="transcript_") as tmpdir:
+        outputs = [
+            [path, remote, ""]
+            for path, remote in await render_stage(
+                ch.name, messages, header_img, os.path.join(tmpdir, "t"), remote_base, formats, session
+            )
+        ]
+        log.info(f"Transcript local: {len(outputs)} arquivo(s) ({len(messages)} msgs)")
+        url = await upload_stage(outputs)
+    return url, outputs
@@ -0,0 +1,43 @@
+# tests/bench_md_lite.py — tempo do md_lite (passada única) vs. o pipeline antigo de split/replace
+# uso: python tests/bench_md_lite.py [repetições]
+import html
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cogs.transcript_html_core import md_lite  # noqa: E402
+
+
+def md_lite_legacy(text: str) -> str:
+    """Versão anterior (várias passadas sobre a string inteira), só para comparação."""
+    if not text:
+        return ""
+    t = html.escape(text, quote=True)
+    for mark, tag, tmp in (("`", "code", ""), ("**", "strong", ""), ("*", "em", ""), ("__", "u", "")):
+        seg = t.replace(mark, tmp).split(tmp)
+        for i in range(1, len(seg), 2):
+            seg[i] = f"<{tag}>{seg[i]}</{tag}>"
+        t = "".join(seg)
+    return t.replace("\n", "<br>")
+
+
+CORPUS = {
+    "texto simples": "Olá, tudo bem? Preciso de ajuda com o pedido 1234 & o pagamento < 5 dias.",
+    "markdown misto": "**Pedido** *urgente* __hoje__ ~~ontem~~ `cod <x>` ||spoiler|| [site](https://exemplo.com/a?b=1)\n> citação",
+    "mensagem longa": ("Linha com **negrito**, *itálico* e `código` https://exemplo.com/x_y.\n" * 200),
+}
+
+
+def main():
+    reps = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    print(f"{'entrada':<16}{'md_lite':>12}{'legado':>12}  (µs por chamada, {reps} repetições)")
+    for name, text in CORPUS.items():
+        new = timeit.timeit(lambda: md_lite(text), number=reps) / reps * 1e6
+        old = timeit.timeit(lambda: md_lite_legacy(text), number=reps) / reps * 1e6
+        print(f"{name:<16}{new:>12.1f}{old:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
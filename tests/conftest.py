@@ -0,0 +1,5 @@
+# tests/conftest.py — raiz do projeto no sys.path (os módulos importam `utils.*` / `cogs.*`)
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,19 @@
+# tests/test_image_formats.py — o que o otimizador gera o uploader precisa aceitar
+import pytest
+
+from utils.ftp_uploader import IMAGE_OUTPUT_FORMATS, _clean_filename
+from utils.image_optimizer import IMAGE_FORMAT, _MIME
+
+
+@pytest.mark.parametrize("fmt", IMAGE_OUTPUT_FORMATS)
+def test_optimizer_output_keeps_its_extension(fmt):
+    assert _clean_filename(f"att_1_foto.{fmt}") == f"att_1_foto.{fmt}"
+
+
+def test_optimizer_formats_match_uploader():
+    assert set(_MIME) == set(IMAGE_OUTPUT_FORMATS)
+    assert IMAGE_FORMAT in IMAGE_OUTPUT_FORMATS
+
+
+def test_unknown_extension_still_becomes_html():
+    assert _clean_filename("x.exe") == "x.exe.html"
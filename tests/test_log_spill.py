@@ -0,0 +1,100 @@
+# tests/test_log_spill.py — excedente de logs em disco (JSONL) após crash no meio da escrita
+import asyncio
+import json
+import os
+
+from cogs.logs import _OverflowSpill
+
+
+def _seed(path, raw: bytes):
+    with open(path, "wb") as f:
+        f.write(raw)
+
+
+def _opened(path) -> _OverflowSpill:
+    spill = _OverflowSpill(path)
+    asyncio.run(spill.open())
+    return spill
+
+
+def _pop(spill, limit=None):
+    return asyncio.run(spill.pop(limit))
+
+
+def test_truncated_tail_is_dropped_on_load(tmp_path):
+    path = str(tmp_path / "1.jsonl")
+    _seed(path, b'{"kind": "a"}\n{"kind": "b"}\n{"kind": "c", "emb')
+    spill = _opened(path)
+    assert spill.count == 2
+
+    # o próximo registro não pode grudar no fragmento
+    spill.append({"kind": "d"})
+    assert [r["kind"] for r in _pop(spill)] == ["a", "b", "d"]
+    assert spill.count == 0
+    assert not os.path.exists(path)
+
+
+def test_invalid_lines_are_consumed(tmp_path):
+    path = str(tmp_path / "1.jsonl")
+    _seed(path, b'{"kind": "a"}\nlixo\n\n{"kind": "b"}\n')
+    spill = _opened(path)
+    assert spill.count == 4
+
+    assert [r["kind"] for r in _pop(spill, 1)] == ["a"]
+    assert [r["kind"] for r in _pop(spill, 1)] == ["b"]
+    assert spill.count == 0
+    assert _pop(spill) == []
+
+
+def test_missing_file_resets_count(tmp_path):
+    path = str(tmp_path / "1.jsonl")
+    spill = _OverflowSpill(path)
+    for i in range(3):
+        spill.append({"i": i})
+    asyncio.run(spill.flush())
+    os.remove(path)
+    assert _pop(spill) == []
+    assert spill.count == 0
+
+
+def test_append_stays_in_memory_until_flush(tmp_path):
+    spill = _OverflowSpill(str(tmp_path / "1.jsonl"))
+    for i in range(3):
+        spill.append({"i": i})
+    assert spill.count == 3
+    assert not os.path.exists(spill.path)
+    asyncio.run(spill.flush())
+    assert _opened(spill.path).count == 3  # o que foi gravado sobrevive a restart
+
+
+def test_pop_respects_limit_and_order(tmp_path):
+    spill = _OverflowSpill(str(tmp_path / "1.jsonl"))
+    for i in range(5):
+        spill.append({"i": i})
+    assert [r["i"] for r in _pop(spill, 2)] == [0, 1]
+    assert spill.count == 3
+    reopened = json.loads(open(spill.path, encoding="utf-8").readline())
+    assert reopened == {"i": 0}  # o arquivo só é apagado quando esvazia
+    spill.append({"i": 5})
+    assert [r["i"] for r in _pop(spill)] == [2, 3, 4, 5]
+    assert spill.count == 0
+
+
+def test_flush_loop_ends_when_spill_has_only_garbage(tmp_path, monkeypatch):
+    import types
+
+    import cogs.logs as logs
+
+    monkeypatch.setattr(logs, "SPILL_DIR", str(tmp_path))
+    _seed(str(tmp_path / "1.jsonl"), b'{"embed": 1}\nlixo\n{"kind": "x"}\n{"emb')
+
+    cog = logs.LogsCog(types.SimpleNamespace())
+    guild = types.SimpleNamespace(id=1)
+
+    async def run():
+        await cog._spill_for(1).open()
+        cog._ensure_flusher(guild)
+        await asyncio.wait_for(cog._flushers[1], timeout=2)
+
+    asyncio.run(run())
+    assert cog._spill_for(1).count == 0
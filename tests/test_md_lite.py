@@ -0,0 +1,46 @@
+# tests/test_md_lite.py — saída de referência do renderer de markdown dos transcripts
+import pytest
+
+from cogs.transcript_html_core import md_lite
+
+LINK = 'target="_blank" rel="noopener"'
+
+
+@pytest.mark.parametrize("text, expected", [
+    # aninhamento
+    ("**a *b* c**", "<strong>a <em>b</em> c</strong>"),
+    ("*a **b** c*", "<em>a <strong>b</strong> c</em>"),
+    ("***x***", "<strong><em>x</em></strong>"),
+    ("__u__ _i_", "<u>u</u> <em>i</em>"),
+    ("~~s~~ ||sp||", '<s>s</s> <span class="spoiler">sp</span>'),
+    # delimitador sem par fica literal
+    ("**unclosed", "**unclosed"),
+    ("\\*not\\*", "*not*"),
+    # código: markdown e menções dentro ficam literais (e escapados)
+    ("`**x** <b>`", "<code>**x** &lt;b&gt;</code>"),
+    ("`<@123>` e <@123>", "<code>&lt;@123&gt;</code> e &lt;@123&gt;"),
+    ("```py\n**x**\n```", "<pre><code>**x**</code></pre>"),
+    # escape de HTML
+    ("a & b < c > d", "a &amp; b &lt; c &gt; d"),
+    ('"q"', "&quot;q&quot;"),
+    # links
+    ("[site](https://x.com/a?b=1&c=2)", f'<a href="https://x.com/a?b=1&amp;c=2" {LINK}>site</a>'),
+    ("https://x.com/a_b_c", f'<a href="https://x.com/a_b_c" {LINK}>https://x.com/a_b_c</a>'),
+    # quebras e citação
+    ("a\nb", "a<br>b"),
+    ("> quote\nnext", "<blockquote>quote</blockquote>next"),
+    ("", ""),
+])
+def test_md_lite_golden(text, expected):
+    assert md_lite(text) == expected
+
+
+def test_md_lite_never_leaks_raw_html():
+    out = md_lite("**<script>alert(1)</script>** `<img src=x onerror=y>` [x](https://a.b/\"><b>)")
+    assert "<script>" not in out and "<img" not in out and '"><b>' not in out
+
+
+def test_md_lite_linear_on_unbalanced_delimiters():
+    # entrada patológica para o pipeline antigo de regex; aqui só precisa terminar e ficar literal
+    text = "[" * 20000 + "](" + "\\" * 20000
+    assert md_lite(text) == "[" * 20000 + "](" + "\\" * 10000
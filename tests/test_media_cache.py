@@ -0,0 +1,25 @@
+# tests/test_media_cache.py — chave de cache das imagens dos transcripts
+from utils.media_cache import _guess_mime, normalize_url
+
+
+def test_discord_signed_params_are_dropped():
+    a = normalize_url("https://cdn.discordapp.com/attachments/1/2/a.png?ex=1&is=2&hm=abc")
+    b = normalize_url("https://CDN.discordapp.com/attachments/1/2/a.png?hm=def&is=3&ex=4#x")
+    assert a == b == "https://cdn.discordapp.com/attachments/1/2/a.png"
+
+
+def test_discord_media_keeps_other_params_sorted():
+    url = "https://media.discordapp.net/attachments/1/2/a.png?width=400&ex=1&format=webp&hm=z"
+    assert normalize_url(url) == "https://media.discordapp.net/attachments/1/2/a.png?format=webp&width=400"
+
+
+def test_query_selects_image_on_other_hosts():
+    a = normalize_url("https://images-ext-1.discordapp.net/external/x/https/site/img?size=64")
+    b = normalize_url("https://images-ext-1.discordapp.net/external/x/https/site/img?size=128")
+    assert a != b
+    assert normalize_url("https://proxy.test/i?id=2&hm=1") == "https://proxy.test/i?hm=1&id=2"
+
+
+def test_mime_ignores_query():
+    assert _guess_mime("https://x.test/a.webp?size=64") == "image/webp"
+    assert _guess_mime("https://x.test/a?format=png", fallback="x") == "x"
@@ -0,0 +1,111 @@
+# tests/test_ratelimit.py — matemática do GCRA com relógio falso (sem esperar de verdade)
+import asyncio
+
+import pytest
+
+from utils import ratelimit
+from utils.ratelimit import Bucket, RateLimiter
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float):
+        self.now += seconds
+
+
+def test_burst_is_free_then_spaced_by_interval():
+    clock = FakeClock()
+    b = Bucket(rate=2, burst=3, clock=clock)  # 1 vaga a cada 0.5s, rajada de 3
+    assert [b.reserve() for _ in range(3)] == [0, 0, 0]
+    assert b.reserve() == pytest.approx(0.5)
+    assert b.reserve() == pytest.approx(1.0)  # fila: cada um espera atrás do anterior
+
+
+def test_refill_after_idle_restores_burst_but_not_more():
+    clock = FakeClock()
+    b = Bucket(rate=1, burst=2, clock=clock)
+    b.reserve(); b.reserve()
+    assert b.peek() == pytest.approx(1.0)
+    clock.now += 1.0
+    assert b.reserve() == 0
+    clock.now += 60  # ocioso por muito tempo: volta só até a rajada
+    assert [b.reserve() for _ in range(2)] == [0, 0]
+    assert b.reserve() == pytest.approx(1.0)
+
+
+def test_cost_counts_multiple_tokens():
+    clock = FakeClock()
+    b = Bucket(rate=10, burst=5, clock=clock)
+    assert b.reserve(cost=5) == 0
+    assert b.reserve(cost=2) == pytest.approx(0.2)
+
+
+def test_peek_does_not_reserve():
+    clock = FakeClock()
+    b = Bucket(rate=1, burst=1, clock=clock)
+    b.reserve()
+    assert b.peek() == b.peek() == pytest.approx(1.0)
+
+
+def test_bucket_is_idle_once_its_schedule_has_passed():
+    clock = FakeClock()
+    b = Bucket(rate=1, burst=1, clock=clock)
+    b.reserve()
+    assert not b.idle(clock())
+    clock.now += 1.0
+    assert b.idle(clock())
+
+
+def _limiter(clock):
+    rl = RateLimiter(clock=clock)
+    rl.configure("global", 100, 2)
+    rl.configure("channel", 1, 5)
+    rl.configure("log", 1, 1, charge_global=False)
+    return rl
+
+
+def test_acquire_waits_on_global_bucket(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(ratelimit.asyncio, "sleep", clock.sleep)
+    rl = _limiter(clock)
+
+    async def run():
+        for key in range(3):  # canais diferentes, mas o global só tem rajada 2
+            await rl.acquire("channel", key)
+
+    asyncio.run(run())
+    assert clock.now == pytest.approx(1000.01)
+    m = rl.metrics()["channel"]
+    assert (m["acquired"], m["waited"], m["buckets"]) == (3, 1, 3)
+
+
+def test_policy_route_does_not_charge_global(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(ratelimit.asyncio, "sleep", clock.sleep)
+    rl = _limiter(clock)
+
+    async def run():
+        await rl.acquire("log", 1)
+        await rl.acquire("channel", 1)
+        await rl.acquire("channel", 2)
+
+    asyncio.run(run())
+    assert clock.now == 1000.0  # só 2 cobranças no global (rajada 2): ninguém esperou
+
+
+def test_unknown_route_raises():
+    with pytest.raises(KeyError):
+        RateLimiter().bucket("nada")
+
+
+def test_reconfigure_updates_existing_buckets():
+    clock = FakeClock()
+    rl = _limiter(clock)
+    b = rl.bucket("channel", 1)
+    rl.configure("channel", 4, 1)
+    assert (b.interval, b.burst) == (0.25, 1)
@@ -0,0 +1,27 @@
+# tests/test_ticket_capture.py — lacunas da captura ao vivo (bot fora do ar)
+from utils.ticket_capture import TicketCapture
+
+
+def test_gap_from_disconnect_to_ready(tmp_path):
+    cap = TicketCapture(str(tmp_path / "cap.db"))
+    cap.upsert(1, 100, {"id": 100})
+    cap.mark_alive(150)
+    cap.open_gap(200)
+    cap.upsert(1, 300, {"id": 300})
+    assert cap.gaps_for(100, 300) == [(150, 200)]
+    # outro canal capturado só depois da volta não é afetado
+    assert cap.gaps_for(250, 400) == []
+
+
+def test_crash_without_disconnect_uses_last_captured(tmp_path):
+    cap = TicketCapture(str(tmp_path / "cap.db"))
+    cap.upsert(1, 100, {"id": 100})
+    cap.open_gap(500)
+    assert cap.gaps_for(100, 600) == [(100, 500)]
+
+
+def test_first_start_opens_no_gap(tmp_path):
+    cap = TicketCapture(str(tmp_path / "cap.db"))
+    cap.open_gap(500)
+    cap.upsert(1, 600, {"id": 600})
+    assert cap.gaps_for(0, 10**9) == []
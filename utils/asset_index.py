@@ -0,0 +1,83 @@
+# ==========================================================
+# utils/asset_index.py — índice dos arquivos já espelhados no FTP
+# nome remoto (ID do anexo / hash do ícone) + hash do conteúdo -> URL pública;
+# consultado antes de baixar/enviar: transcript repetido não transfere nada
+# ==========================================================
+
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+import time
+from typing import Optional
+
+from utils import env
+
+log = logging.getLogger("asset_index")
+
+# confere no servidor (MLST/SIZE) se o arquivo do índice ainda existe antes de reaproveitar
+VERIFY_REMOTE: bool = env.get_bool("ASSET_INDEX_VERIFY", False)
+
+
+class AssetIndex:
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        # conexão preguiçosa (só no primeiro mirror)
+        if self._conn is None:
+            self._conn = self._connect()
+        return self._conn
+
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        db = sqlite3.connect(self.path, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            """CREATE TABLE IF NOT EXISTS assets (
+                name TEXT PRIMARY KEY,
+                source_url TEXT NOT NULL DEFAULT '',
+                digest TEXT NOT NULL DEFAULT '',
+                url TEXT NOT NULL,
+                size INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL
+            )"""
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS ix_assets_digest ON assets(digest)")
+        return db
+
+    def url_for_name(self, name: str) -> Optional[str]:
+        row = self._db.execute("SELECT url FROM assets WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def url_for_digest(self, digest: str) -> Optional[str]:
+        """Mesmo conteúdo já enviado com outro nome (ex.: imagem reenviada em outro ticket)."""
+        if not digest:
+            return None
+        row = self._db.execute(
+            "SELECT url FROM assets WHERE digest = ? ORDER BY created_at LIMIT 1", (digest,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def record(self, name: str, url: str, *, source_url: str = "", digest: str = "", size: int = 0):
+        self._db.execute(
+            "INSERT INTO assets (name, source_url, digest, url, size, created_at) VALUES (?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT(name) DO UPDATE SET url = excluded.url,"
+            " digest = CASE WHEN excluded.digest != '' THEN excluded.digest ELSE assets.digest END,"
+            " size = CASE WHEN excluded.size > 0 THEN excluded.size ELSE assets.size END",
+            (name, source_url, digest, url, size, time.time()),
+        )
+
+    def forget(self, name: str):
+        self._db.execute("DELETE FROM assets WHERE name = ?", (name,))
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+asset_index = AssetIndex(os.path.join(env.data_dir(), "asset_index.db"))
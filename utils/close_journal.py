@@ -0,0 +1,160 @@
+# ==========================================================
+# utils/close_journal.py — diário persistente da fila de fechamento
+# cada ticket vira um job em SQLite com a última etapa concluída;
+# após crash/restart o worker retoma de onde parou
+# ==========================================================
+
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+import time
+from dataclasses import dataclass, fields
+from typing import List, Optional
+
+from utils import env
+
+log = logging.getLogger("close_journal")
+
+DATA_DIR: str = env.data_dir()
+
+# ordem das etapas; `stage` guarda a última concluída
+STAGES = ("queued", "collect", "render", "upload", "notify", "delete", "done")
+
+
+@dataclass
+class CloseJob:
+    id: int
+    guild_id: int
+    channel_id: int
+    channel_name: str
+    closer_id: int
+    category: str
+    reason: str
+    stage: str = "queued"
+    opener_id: int = 0
+    messages_path: str = ""
+    outputs: str = "[]"        # JSON: [[caminho local, nome remoto, url], ...] — o primeiro é o principal
+    transcript_url: str = ""
+    attempts: int = 0          # falhas seguidas (o worker tenta de novo com backoff)
+    failed: int = 0            # 1 = desistiu; não é retomado e não bloqueia novo fechamento
+    error: str = ""
+    created_at: float = 0.0
+    updated_at: float = 0.0
+
+    def done(self, stage: str) -> bool:
+        """True se a etapa `stage` já foi concluída."""
+        return STAGES.index(self.stage) >= STAGES.index(stage)
+
+    def work_path(self, suffix: str) -> str:
+        return os.path.join(DATA_DIR, "close_jobs", f"{self.id}{suffix}")
+
+
+_COLUMNS = [f.name for f in fields(CloseJob)]
+
+
+class CloseJournal:
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        # aberta no primeiro uso: importar o módulo não cria arquivo nem pasta
+        if self._conn is None:
+            self._conn = self._connect()
+        return self._conn
+
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        os.makedirs(os.path.join(DATA_DIR, "close_jobs"), exist_ok=True)
+        db = sqlite3.connect(self.path, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            """CREATE TABLE IF NOT EXISTS close_jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                guild_id INTEGER NOT NULL,
+                channel_id INTEGER NOT NULL,
+                channel_name TEXT NOT NULL DEFAULT '',
+                closer_id INTEGER NOT NULL,
+                category TEXT NOT NULL DEFAULT '',
+                reason TEXT NOT NULL DEFAULT '',
+                stage TEXT NOT NULL DEFAULT 'queued',
+                opener_id INTEGER NOT NULL DEFAULT 0,
+                messages_path TEXT NOT NULL DEFAULT '',
+                outputs TEXT NOT NULL DEFAULT '[]',
+                transcript_url TEXT NOT NULL DEFAULT '',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                failed INTEGER NOT NULL DEFAULT 0,
+                error TEXT NOT NULL DEFAULT '',
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )"""
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS ix_close_jobs_stage ON close_jobs(stage)")
+        return db
+
+    @staticmethod
+    def _row(row: sqlite3.Row) -> CloseJob:
+        return CloseJob(**{k: row[k] for k in _COLUMNS})
+
+    def add(
+        self, *, guild_id: int, channel_id: int, channel_name: str,
+        closer_id: int, category: str, reason: str, opener_id: int = 0,
+    ) -> CloseJob:
+        now = time.time()
+        cur = self._db.execute(
+            "INSERT INTO close_jobs (guild_id, channel_id, channel_name, closer_id, category, reason,"
+            " stage, opener_id, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, 'queued', ?, ?, ?)",
+            (guild_id, channel_id, channel_name, closer_id, category, reason, opener_id, now, now),
+        )
+        return self.get(cur.lastrowid)
+
+    def get(self, job_id: int) -> Optional[CloseJob]:
+        row = self._db.execute("SELECT * FROM close_jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row(row) if row else None
+
+    def advance(self, job: CloseJob, stage: str, **changes):
+        """Marca `stage` como concluída (e grava campos extras, ex.: transcript_url)."""
+        assert stage in STAGES
+        self._set(job, stage=stage, **changes)
+
+    def _set(self, job: CloseJob, **changes):
+        changes["updated_at"] = time.time()
+        cols = ", ".join(f"{k} = ?" for k in changes)
+        self._db.execute(f"UPDATE close_jobs SET {cols} WHERE id = ?", (*changes.values(), job.id))
+        for k, v in changes.items():
+            setattr(job, k, v)
+
+    def record_error(self, job: CloseJob, error: str) -> int:
+        """Conta mais uma falha (a etapa concluída não muda) e devolve o total."""
+        self._set(job, attempts=job.attempts + 1, error=error[:500])
+        return job.attempts
+
+    def fail(self, job: CloseJob, error: str):
+        """Desiste do job: sai dos pendentes e libera o canal para um novo fechamento."""
+        self._set(job, failed=1, error=error[:500])
+
+    def pending(self) -> List[CloseJob]:
+        rows = self._db.execute(
+            "SELECT * FROM close_jobs WHERE stage != 'done' AND failed = 0 ORDER BY id"
+        ).fetchall()
+        return [self._row(r) for r in rows]
+
+    def active_for_channel(self, channel_id: int) -> Optional[CloseJob]:
+        row = self._db.execute(
+            "SELECT * FROM close_jobs WHERE channel_id = ? AND stage != 'done' AND failed = 0"
+            " ORDER BY id LIMIT 1",
+            (channel_id,),
+        ).fetchone()
+        return self._row(row) if row else None
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+journal = CloseJournal(os.path.join(DATA_DIR, "close_jobs.db"))
@@ -44,7 +44,20 @@ def get_int(name: str, default: int = 0) -> int:
     """Pega um valor numérico do .env"""
     return _safe_int(os.getenv(name), default)
 
+def get_bool(name: str, default: bool = False) -> bool:
+    """Pega uma flag do .env (1/true/yes/on — 0/false/no/off)"""
+    raw = _s(os.getenv(name), "").lower()
+    if raw in ("1", "true", "t", "yes", "y", "on"):
+        return True
+    if raw in ("0", "false", "f", "no", "n", "off"):
+        return False
+    return default
+
 # ========= Específicos do bot =========
+def data_dir() -> str:
+    """Pasta dos dados locais (fila de fechamento, índices, captura, excedente de logs)"""
+    return _s(os.getenv("TICKET_DATA_DIR"), "data") or "data"
+
 def token() -> str:
     return _s(os.getenv("DISCORD_TOKEN"), "")
 
@@ -3,13 +3,28 @@
 # usuário FTP já inicia em /public_html/transcripts
 # ==========================================================
 
+import io
 import os
+import time
 import asyncio
 import logging
-from typing import Optional
+from contextlib import asynccontextmanager, aclosing, nullcontext
+from typing import Optional, List, Tuple, Callable, AsyncIterator, Union
 
 log = logging.getLogger("transcript")
 
+FTP_POOL_SIZE = max(1, int(os.getenv("FTP_POOL_SIZE", "3") or 3))
+FTP_POOL_IDLE_SECONDS = float(os.getenv("FTP_POOL_IDLE_SECONDS", "60") or 60)
+FTP_POOL_NOOP_AFTER = float(os.getenv("FTP_POOL_NOOP_AFTER", "15") or 15)
+FTP_TIMEOUT = float(os.getenv("FTP_TIMEOUT", "30") or 30)
+FTP_CHUNK_SIZE = max(4096, int(os.getenv("FTP_CHUNK_SIZE", "65536") or 65536))
+
+# progress(enviados, total) — chamado no loop a cada bloco enviado
+ProgressCallback = Callable[[int, int], None]
+
+# origem do upload: caminho local, bytes em memória ou stream assíncrono (ex.: corpo HTTP)
+UploadSource = Union[str, bytes, bytearray, memoryview, AsyncIterator[bytes]]
+
 try:
     import aioftp
     HAS_AIOFTP = True
@@ -18,11 +33,21 @@ except Exception:
     import ftplib
 
 
+# formatos que o otimizador de imagens pode gerar (utils/image_optimizer importa daqui)
+IMAGE_OUTPUT_FORMATS = ("webp", "avif")
+
+# extensões aceitas como estão; qualquer outra vira .html (comportamento antigo)
+_ALLOWED_EXTS = (
+    ".html", ".html.gz", ".html.br", ".jsonl", ".json", ".md", ".txt",
+    ".png", ".jpg", ".jpeg", ".gif",
+) + tuple(f".{fmt}" for fmt in IMAGE_OUTPUT_FORMATS)
+
+
 def _clean_filename(name: str) -> str:
-    """Garante nome válido e extensão .html"""
+    """Garante nome válido e extensão conhecida (padrão .html)"""
     base = os.path.basename(str(name)).strip().replace("\\", "/")
     base = base.replace("/", "_")
-    if not base.lower().endswith(".html"):
+    if not base.lower().endswith(_ALLOWED_EXTS):
         base += ".html"
     return base
 
@@ -34,26 +59,169 @@ def _public_url(filename: str) -> str:
 
 
 # ==========================================================
-# Upload com aioftp — simples e direto
+# Pool de sessões aioftp já autenticadas
 # ==========================================================
-async def _upload_aioftp(local_path: str, remote_filename: str) -> str:
+def _ftp_credentials() -> Tuple[str, str, str]:
     host = os.getenv("HOSTGATOR_FTP_HOST")
     user = os.getenv("HOSTGATOR_FTP_USER")
     pwd = os.getenv("HOSTGATOR_FTP_PASS")
-
     if not (host and user and pwd):
         raise RuntimeError("HOSTGATOR_FTP_HOST/USER/PASS não configuradas.")
+    return host, user, pwd
+
+
+class _FTPPool:
+    """Mantém até `size` sessões logadas; reaproveita, testa (NOOP) e reconecta."""
+
+    def __init__(self, size: int = FTP_POOL_SIZE, idle_timeout: float = FTP_POOL_IDLE_SECONDS):
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self._sem: Optional[asyncio.Semaphore] = None
+        self._idle: List[Tuple["aioftp.Client", float]] = []  # (client, último uso)
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.size)
+        return self._sem
+
+    async def _connect(self) -> "aioftp.Client":
+        host, user, pwd = _ftp_credentials()
+        client = aioftp.Client(socket_timeout=FTP_TIMEOUT)
+        try:
+            await client.connect(host)
+            await client.login(user, pwd)
+        except Exception:
+            client.close()
+            raise
+        log.info(f"[aioftp] Nova sessão FTP autenticada ({host})")
+        return client
+
+    @staticmethod
+    async def _discard(client: "aioftp.Client"):
+        try:
+            await asyncio.wait_for(client.quit(), timeout=5)
+        except Exception:
+            pass
+        try:
+            client.close()
+        except Exception:
+            pass
+
+    async def _healthy(self, client: "aioftp.Client", last_used: float) -> bool:
+        idle = time.monotonic() - last_used
+        if idle > self.idle_timeout:
+            return False  # servidor provavelmente já derrubou por inatividade
+        if idle < FTP_POOL_NOOP_AFTER:
+            return True
+        try:
+            await asyncio.wait_for(client.command("NOOP", "2xx"), timeout=5)
+            return True
+        except Exception:
+            return False
+
+    async def _take(self, fresh: bool = False) -> "aioftp.Client":
+        if fresh:
+            # sessões ociosas também podem ter caído junto — descarta e abre uma nova
+            idle, self._idle = self._idle, []
+            for client, _ in idle:
+                await self._discard(client)
+        while self._idle:
+            client, last_used = self._idle.pop()
+            if await self._healthy(client, last_used):
+                return client
+            await self._discard(client)
+        return await self._connect()
+
+    @asynccontextmanager
+    async def acquire(self, fresh: bool = False):
+        async with self._semaphore():
+            client = await self._take(fresh)
+            try:
+                yield client
+            except BaseException:
+                await self._discard(client)  # sessão em estado desconhecido
+                raise
+            else:
+                self._idle.append((client, time.monotonic()))
+
+    async def close(self):
+        idle, self._idle = self._idle, []
+        for client, _ in idle:
+            await self._discard(client)
 
+
+_pool = _FTPPool()
+
+
+async def close_ftp_pool():
+    """Encerra as sessões FTP ociosas (chamar no shutdown do bot)."""
+    await _pool.close()
+
+
+# ==========================================================
+# Leitura da origem em blocos (arquivo fora do loop, memória sem cópia)
+# ==========================================================
+async def _read_chunks(local_path: str, chunk_size: int = FTP_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    loop = asyncio.get_running_loop()
+    f = await loop.run_in_executor(None, open, local_path, "rb")
+    try:
+        while True:
+            chunk = await loop.run_in_executor(None, f.read, chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        f.close()
+
+
+async def _memory_chunks(data: memoryview, chunk_size: int = FTP_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    for start in range(0, len(data), chunk_size):
+        yield data[start:start + chunk_size]
+
+
+def _open_source(source: UploadSource) -> Tuple[AsyncIterator[bytes], int]:
+    """(blocos, tamanho total — 0 se desconhecido) para qualquer origem aceita."""
+    if isinstance(source, str):
+        return _read_chunks(source), os.path.getsize(source)
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        view = memoryview(source).cast("B")
+        return _memory_chunks(view), len(view)
+    return source, 0
+
+
+# ==========================================================
+# Upload com aioftp — reaproveitando sessões do pool
+# ==========================================================
+async def _upload_aioftp(source: UploadSource, remote_filename: str, progress: Optional[ProgressCallback] = None) -> str:
+    _ftp_credentials()
     fname = _clean_filename(remote_filename)
 
     # 💡 O usuário FTP já está em /public_html/transcripts/
     remote_path = fname
+    # stream assíncrono só pode ser lido uma vez: sem segunda tentativa
+    attempts = (1, 2) if isinstance(source, (str, bytes, bytearray, memoryview)) else (2,)
 
-    async with aioftp.Client.context(host, user=user, password=pwd) as client:
-        log.info(f"[aioftp] Fazendo upload direto: {remote_path}")
-        async with client.upload_stream(remote_path) as stream:
-            with open(local_path, "rb") as f:
-                await stream.write(f.read())
+    for attempt in attempts:
+        try:
+            async with _pool.acquire(fresh=attempt > attempts[0]) as client:
+                log.info(f"[aioftp] Fazendo upload direto: {remote_path}")
+                chunks, total = _open_source(source)
+                sent = 0
+                async with client.upload_stream(remote_path) as stream:
+                    # um bloco por vez: o próximo só é lido depois que o anterior drenou no socket
+                    closer = aclosing(chunks) if hasattr(chunks, "aclose") else nullcontext(chunks)
+                    async with closer as chunks:
+                        async for chunk in chunks:
+                            await stream.write(chunk)
+                            sent += len(chunk)
+                            if progress:
+                                progress(sent, total or sent)
+            break
+        except (OSError, asyncio.TimeoutError) as e:
+            # sessão reaproveitada pode ter caído no meio — tenta uma vez com conexão nova
+            if attempt == 2:
+                raise
+            log.warning(f"[aioftp] Sessão FTP caiu ({e}); tentando novamente")
 
     url = _public_url(fname)
     log.info(f"[aioftp] Upload concluído: {url}")
@@ -63,7 +231,8 @@ async def _upload_aioftp(local_path: str, remote_filename: str) -> str:
 # ==========================================================
 # Upload com ftplib — fallback se aioftp não estiver disponível
 # ==========================================================
-def _upload_ftplib(local_path: str, remote_filename: str) -> str:
+def _upload_ftplib(source, remote_filename: str, progress: Optional[ProgressCallback] = None) -> str:
+    """`source`: caminho local ou bytes-like (streams já chegam materializados)."""
     host = os.getenv("HOSTGATOR_FTP_HOST")
     user = os.getenv("HOSTGATOR_FTP_USER")
     pwd = os.getenv("HOSTGATOR_FTP_PASS")
@@ -80,8 +249,18 @@ def _upload_ftplib(local_path: str, remote_filename: str) -> str:
         ftp.set_pasv(True)
 
         # ⚠️ NÃO muda de pasta (já começa em /public_html/transcripts)
-        with open(local_path, "rb") as f:
-            ftp.storbinary(f"STOR {fname}", f)
+        in_memory = not isinstance(source, str)
+        total = memoryview(source).nbytes if in_memory else os.path.getsize(source)
+        sent = 0
+
+        def _on_block(block: bytes):
+            nonlocal sent
+            sent += len(block)
+            if progress:
+                progress(sent, total)
+
+        with (io.BytesIO(source) if in_memory else open(source, "rb")) as f:
+            ftp.storbinary(f"STOR {fname}", f, blocksize=FTP_CHUNK_SIZE, callback=_on_block)
 
     finally:
         try:
@@ -94,21 +273,75 @@ def _upload_ftplib(local_path: str, remote_filename: str) -> str:
     return url
 
 
+# ==========================================================
+# Arquivo remoto já existe? (evita reenviar o mesmo anexo)
+# ==========================================================
+async def _remote_size_aioftp(fname: str) -> int:
+    async with _pool.acquire() as client:
+        try:
+            info = await client.stat(fname)
+        except aioftp.StatusCodeError:
+            return 0  # 550: não existe (sessão continua boa)
+        return int(info.get("size") or 0)
+
+
+def _remote_size_ftplib(fname: str) -> int:
+    host, user, pwd = _ftp_credentials()
+    ftp = ftplib.FTP()
+    try:
+        ftp.connect(host, 21, timeout=30)
+        ftp.login(user, pwd)
+        ftp.voidcmd("TYPE I")
+        try:
+            return int(ftp.size(fname) or 0)
+        except ftplib.error_perm:
+            return 0  # 550: não existe
+    finally:
+        try:
+            ftp.quit()
+        except Exception:
+            pass
+
+
+async def remote_exists(remote_filename: str) -> Optional[str]:
+    """URL pública se o arquivo já estiver no servidor (tamanho > 0); None se não existir/falhar."""
+    fname = _clean_filename(remote_filename)
+    try:
+        if HAS_AIOFTP:
+            size = await _remote_size_aioftp(fname)
+        else:
+            size = await asyncio.get_running_loop().run_in_executor(None, _remote_size_ftplib, fname)
+    except Exception as e:
+        log.warning(f"Não foi possível verificar {fname} no servidor: {e}")
+        return None
+    return _public_url(fname) if size > 0 else None
+
+
 # ==========================================================
 # Função principal
 # ==========================================================
-async def upload_to_hostgator(local_path: str, remote_filename: str) -> Optional[str]:
-    """Faz upload direto do arquivo HTML para o diretório base do FTP"""
-    if not os.path.isfile(local_path):
-        log.error(f"Arquivo local não existe: {local_path}")
+async def upload_to_hostgator(
+    source: UploadSource,
+    remote_filename: str,
+    progress: Optional[ProgressCallback] = None,
+) -> Optional[str]:
+    """Envia para o diretório base do FTP em blocos de FTP_CHUNK_SIZE.
+    `source` pode ser um caminho local, bytes/memoryview ou um async iterator de bytes
+    (ex.: corpo de uma resposta HTTP) — sem passar por arquivo temporário."""
+    if isinstance(source, str) and not os.path.isfile(source):
+        log.error(f"Arquivo local não existe: {source}")
         return None
 
     fname = _clean_filename(remote_filename)
     try:
         if HAS_AIOFTP:
-            return await _upload_aioftp(local_path, fname)
+            return await _upload_aioftp(source, fname, progress)
+        if not isinstance(source, (str, bytes, bytearray, memoryview)):
+            source = b"".join([chunk async for chunk in source])  # ftplib é síncrono
         loop = asyncio.get_running_loop()
-        return await loop.run_in_executor(None, lambda: _upload_ftplib(local_path, fname))
+        # ftplib roda no executor; o progresso volta para o loop com segurança
+        threadsafe = (lambda s, t: loop.call_soon_threadsafe(progress, s, t)) if progress else None
+        return await loop.run_in_executor(None, lambda: _upload_ftplib(source, fname, threadsafe))
     except Exception as e:
         log.exception(f"Falha no upload: {e}")
         return None
@@ -0,0 +1,56 @@
+# ==========================================================
+# utils/http_client.py — sessão HTTP compartilhada do bot
+# criada no setup_hook, fechada no shutdown; cogs acessam via bot
+# ==========================================================
+
+from __future__ import annotations
+
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+import aiohttp
+
+from utils import env
+
+log = logging.getLogger("http_client")
+
+HTTP_POOL_LIMIT: int = env.get_int("HTTP_POOL_LIMIT", 64)
+HTTP_POOL_PER_HOST: int = env.get_int("HTTP_POOL_PER_HOST", 8)
+HTTP_DNS_TTL: int = env.get_int("HTTP_DNS_TTL", 300)
+HTTP_KEEPALIVE: int = env.get_int("HTTP_KEEPALIVE_SECONDS", 30)
+HTTP_TIMEOUT: int = env.get_int("HTTP_TIMEOUT", 45)
+HTTP_CONNECT_TIMEOUT: int = env.get_int("HTTP_CONNECT_TIMEOUT", 10)
+
+
+def create_session() -> aiohttp.ClientSession:
+    """Sessão com pool keep-alive, limite por host, cache de DNS e timeouts."""
+    connector = aiohttp.TCPConnector(
+        limit=HTTP_POOL_LIMIT,
+        limit_per_host=HTTP_POOL_PER_HOST,
+        ttl_dns_cache=HTTP_DNS_TTL,
+        keepalive_timeout=HTTP_KEEPALIVE,
+    )
+    timeout = aiohttp.ClientTimeout(total=HTTP_TIMEOUT, sock_connect=HTTP_CONNECT_TIMEOUT)
+    log.info(
+        f"🌐 Sessão HTTP criada (limit={HTTP_POOL_LIMIT}, por host={HTTP_POOL_PER_HOST}, dns_ttl={HTTP_DNS_TTL}s)"
+    )
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+
+def session_for(bot) -> Optional[aiohttp.ClientSession]:
+    """Sessão do bot, se existir e estiver aberta."""
+    session = getattr(bot, "http_session", None)
+    if session is None or session.closed:
+        return None
+    return session
+
+
+@asynccontextmanager
+async def borrow(session: Optional[aiohttp.ClientSession] = None) -> AsyncIterator[aiohttp.ClientSession]:
+    """Usa a sessão informada; sem ela (ex.: fora do bot), abre uma temporária."""
+    if session is not None and not session.closed:
+        yield session
+        return
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT)) as tmp:
+        yield tmp
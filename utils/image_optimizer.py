@@ -0,0 +1,117 @@
+# ==========================================================
+# utils/image_optimizer.py — reduz imagens dos transcripts (Pillow)
+# redimensiona para o tamanho exibido e converte para WebP/AVIF
+# num pool de processos (não trava o loop); resultado fica no media_cache
+# ==========================================================
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import io
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+
+from utils import env
+from utils.ftp_uploader import IMAGE_OUTPUT_FORMATS
+from utils.media_cache import MediaEntry, media_cache
+
+try:
+    from PIL import Image, features
+    HAS_PIL = True
+except Exception:
+    HAS_PIL = False
+
+log = logging.getLogger("image_optimizer")
+
+OPTIMIZE: bool = env.get_bool("TRANSCRIPT_IMAGE_OPTIMIZE", True) and HAS_PIL
+IMAGE_FORMAT: str = str(env.get("TRANSCRIPT_IMAGE_FORMAT", "webp") or "webp").strip().lower()
+IMAGE_QUALITY: int = env.get_int("TRANSCRIPT_IMAGE_QUALITY", 80)
+# multiplicador dos limites do CSS (2 = nítido em telas HiDPI)
+IMAGE_SCALE: float = float(env.get("TRANSCRIPT_IMAGE_SCALE", "1") or 1)
+IMAGE_WORKERS: int = max(1, env.get_int("TRANSCRIPT_IMAGE_WORKERS", 2))
+
+# limites de exibição (px) — espelham o CSS do transcript
+BOUNDS_ATTACHMENT: Tuple[int, int] = (500, 400)
+BOUNDS_EMBED: Tuple[int, int] = (500, 400)
+BOUNDS_AVATAR: Tuple[int, int] = (42, 42)
+BOUNDS_HEADER: Tuple[int, int] = (92, 92)
+
+if HAS_PIL and IMAGE_FORMAT == "avif" and not features.check("avif"):
+    log.warning("[img-opt] Pillow sem suporte a AVIF — usando WebP")
+    IMAGE_FORMAT = "webp"
+if IMAGE_FORMAT not in IMAGE_OUTPUT_FORMATS:
+    IMAGE_FORMAT = "webp"
+
+_MIME = {"webp": "image/webp", "avif": "image/avif"}
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _shrink(data: bytes, max_w: int, max_h: int, fmt: str, quality: int) -> Optional[bytes]:
+    """Roda no processo filho. None = manter o original (animada, inválida ou sem ganho)."""
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            if getattr(img, "is_animated", False) or img.format == "GIF":
+                return None
+            img.thumbnail((max_w, max_h), Image.LANCZOS)
+            if img.mode not in ("RGB", "RGBA"):
+                img = img.convert("RGBA" if "transparency" in img.info or img.mode in ("LA", "PA") else "RGB")
+            out = io.BytesIO()
+            img.save(out, format=fmt.upper(), quality=quality)
+    except Exception:
+        return None
+    result = out.getvalue()
+    return result if len(result) < len(data) else None
+
+
+def _executor() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: o processo do bot tem threads (discord/aiohttp) — fork herdaria locks em uso
+        _pool = ProcessPoolExecutor(max_workers=IMAGE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def shutdown_image_pool():
+    """Encerra os processos do otimizador (chamar no shutdown do bot)."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def scaled(bounds: Tuple[int, int]) -> Tuple[int, int]:
+    return max(1, int(bounds[0] * IMAGE_SCALE)), max(1, int(bounds[1] * IMAGE_SCALE))
+
+
+def _cache_key(digest: str, bounds: Tuple[int, int]) -> str:
+    return f"opt://{digest}/{bounds[0]}x{bounds[1]}/{IMAGE_FORMAT}-{IMAGE_QUALITY}"
+
+
+async def optimize(entry: MediaEntry, bounds: Tuple[int, int]) -> MediaEntry:
+    """Versão reduzida de `entry` para caber em `bounds` (já escalado); o original se não valer a pena.
+    Resultado em cache por (hash, limites, formato, qualidade)."""
+    if not OPTIMIZE or entry.mime == "image/gif":
+        return entry
+    key = _cache_key(entry.digest, bounds)
+    cached = await media_cache.get(key)
+    if cached is not None:
+        return cached
+
+    loop = asyncio.get_running_loop()
+    try:
+        data = await loop.run_in_executor(_executor(), _shrink, entry.data, *bounds, IMAGE_FORMAT, IMAGE_QUALITY)
+    except Exception as e:
+        # pool quebrado/encerrado: usa o original agora, sem gravar no cache
+        log.warning(f"[img-opt] Falha ao otimizar {entry.digest[:12]}: {e}")
+        return entry
+
+    result = entry if data is None else MediaEntry(hashlib.sha256(data).hexdigest(), data, _MIME[IMAGE_FORMAT])
+    media_cache.alias(key, result)
+    if result is not entry:
+        # já reduzida: otimizar de novo (ex.: após o mirror) devolve ela mesma
+        media_cache.alias(_cache_key(result.digest, bounds), result)
+        log.debug(f"[img-opt] {len(entry.data)} → {len(data)} bytes ({bounds[0]}x{bounds[1]})")
+    return result
@@ -0,0 +1,222 @@
+# ==========================================================
+# utils/media_cache.py — cache de imagens dos transcripts
+# chave: URL normalizada -> hash do conteúdo -> bytes
+# memória com LRU por tamanho + camada opcional em disco
+# ==========================================================
+
+from __future__ import annotations
+
+import asyncio
+import base64
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+from typing import Dict, Optional, Set
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import aiohttp
+
+from utils import env
+from utils.http_client import borrow
+
+log = logging.getLogger("media_cache")
+
+CACHE_MAX_BYTES: int = env.get_int("TRANSCRIPT_CACHE_MAX_MB", 64) * 1024 * 1024
+CACHE_DIR: str = str(env.get("TRANSCRIPT_CACHE_DIR", "") or "").strip()
+FETCH_TIMEOUT: int = env.get_int("TRANSCRIPT_FETCH_TIMEOUT", 30)
+
+
+# CDNs do Discord: links assinados (ex/is/hm) mudam a cada mensagem, o arquivo não
+_SIGNED_HOSTS = frozenset({"cdn.discordapp.com", "media.discordapp.net"})
+_SIGNED_PARAMS = frozenset({"ex", "is", "hm"})
+
+
+def normalize_url(url: str) -> str:
+    """Chave de cache: host minúsculo, sem fragmento, query ordenada. Só nos CDNs do Discord
+    os parâmetros de assinatura são removidos — nos outros hosts a query escolhe a imagem
+    (?size=, ?format=, proxies) e faz parte da chave."""
+    try:
+        parts = urlsplit((url or "").strip())
+    except ValueError:
+        return (url or "").strip()
+    host = parts.netloc.lower()
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    if host in _SIGNED_HOSTS:
+        query = [(k, v) for k, v in query if k not in _SIGNED_PARAMS]
+    return urlunsplit((parts.scheme.lower(), host, parts.path, urlencode(sorted(query)), ""))
+
+
+def _guess_mime(url: str, fallback: str = "image/png") -> str:
+    try:
+        u = urlsplit((url or "").strip()).path.lower()
+    except ValueError:
+        u = (url or "").lower()
+    if u.endswith(".png"): return "image/png"
+    if u.endswith(".jpg") or u.endswith(".jpeg"): return "image/jpeg"
+    if u.endswith(".gif"): return "image/gif"
+    if u.endswith(".webp"): return "image/webp"
+    if u.endswith(".avif"): return "image/avif"
+    return fallback
+
+
+class MediaEntry:
+    """Conteúdo baixado + data URI gerado sob demanda (uma vez)."""
+
+    __slots__ = ("digest", "data", "mime", "_data_uri")
+
+    def __init__(self, digest: str, data: bytes, mime: str):
+        self.digest = digest
+        self.data = data
+        self.mime = mime
+        self._data_uri: Optional[str] = None
+
+    @property
+    def size(self) -> int:
+        return len(self.data) + len(self._data_uri or "")
+
+    def _encode(self) -> str:
+        encoded = base64.b64encode(self.data).decode("ascii")
+        return f"data:{self.mime};base64,{encoded}"
+
+
+class MediaCache:
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES, disk_dir: str = CACHE_DIR):
+        self.max_bytes = max(0, max_bytes)
+        self.disk_dir = disk_dir
+        self._urls: Dict[str, str] = {}                       # url normalizada -> digest
+        self._keys: Dict[str, Set[str]] = {}                  # digest -> urls (somem junto no LRU)
+        self._entries: "OrderedDict[str, MediaEntry]" = OrderedDict()  # digest -> entry (LRU)
+        self._bytes = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+        if self.disk_dir:
+            os.makedirs(os.path.join(self.disk_dir, "urls"), exist_ok=True)
+
+    # ---------- memória ----------
+    def _touch(self, digest: str) -> Optional[MediaEntry]:
+        entry = self._entries.get(digest)
+        if entry is not None:
+            self._entries.move_to_end(digest)
+        return entry
+
+    def _store(self, key: str, entry: MediaEntry) -> MediaEntry:
+        prev = self._urls.get(key)
+        if prev is not None and prev != entry.digest:
+            self._keys.get(prev, set()).discard(key)
+        self._urls[key] = entry.digest
+        self._keys.setdefault(entry.digest, set()).add(key)
+        old = self._entries.get(entry.digest)
+        if old is not None:
+            self._entries.move_to_end(entry.digest)
+            return old
+        self._entries[entry.digest] = entry
+        self._bytes += entry.size
+        self._evict()
+        return entry
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            digest, old = self._entries.popitem(last=False)
+            self._bytes -= old.size
+            # o mapa de urls segue o mesmo LRU: nada aponta para conteúdo removido
+            for key in self._keys.pop(digest, ()):
+                if self._urls.get(key) == digest:
+                    del self._urls[key]
+
+    # ---------- disco ----------
+    def _disk_url_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, "urls", hashlib.sha1(key.encode("utf-8")).hexdigest())
+
+    def _disk_load(self, key: str, mime: str) -> Optional[MediaEntry]:
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_url_path(key), "r", encoding="utf-8") as f:
+                digest = f.read().strip()
+            with open(os.path.join(self.disk_dir, digest), "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        return MediaEntry(digest, data, mime)
+
+    def _disk_save(self, key: str, entry: MediaEntry):
+        if not self.disk_dir:
+            return
+        try:
+            blob = os.path.join(self.disk_dir, entry.digest)
+            if not os.path.exists(blob):
+                with open(blob, "wb") as f:
+                    f.write(entry.data)
+            with open(self._disk_url_path(key), "w", encoding="utf-8") as f:
+                f.write(entry.digest)
+        except OSError as e:
+            log.warning(f"[media-cache] Falha ao gravar em disco: {e}")
+
+    # ---------- API ----------
+    def data_uri(self, entry: MediaEntry) -> str:
+        """Codifica em base64 uma única vez; o resultado conta no limite de memória."""
+        if entry._data_uri is None:
+            entry._data_uri = entry._encode()
+            if self._entries.get(entry.digest) is entry:
+                self._bytes += len(entry._data_uri)
+                self._evict()
+        return entry._data_uri
+
+    async def get(self, url: str) -> Optional[MediaEntry]:
+        """Busca apenas em memória/disco, sem rede (leitura do disco fora do loop)."""
+        key = normalize_url(url)
+        digest = self._urls.get(key)
+        entry = self._touch(digest) if digest else None
+        if entry is None and self.disk_dir:
+            loop = asyncio.get_running_loop()
+            entry = await loop.run_in_executor(None, self._disk_load, key, _guess_mime(url))
+            if entry is not None:
+                entry = self._store(key, entry)
+        return entry
+
+    def alias(self, url: str, entry: MediaEntry):
+        """Registra outra URL (ex.: cópia espelhada) para um conteúdo já em cache."""
+        self._store(normalize_url(url), entry)
+
+    async def fetch(self, url: str, session: Optional[aiohttp.ClientSession] = None) -> Optional[MediaEntry]:
+        """Retorna o conteúdo da URL, baixando no máximo uma vez por processo."""
+        entry = await self.get(url)
+        if entry is not None:
+            return entry
+
+        key = normalize_url(url)
+        pending = self._inflight.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        entry = None
+        try:
+            entry = await self._download(url, key, session)
+        finally:
+            self._inflight.pop(key, None)
+            fut.set_result(entry)
+        return entry
+
+    async def _download(self, url: str, key: str, session: Optional[aiohttp.ClientSession]) -> Optional[MediaEntry]:
+        try:
+            async with borrow(session) as http:
+                async with http.get(url, timeout=aiohttp.ClientTimeout(total=FETCH_TIMEOUT)) as resp:
+                    if resp.status != 200:
+                        log.warning(f"[media-cache] Download falhou {resp.status} para {url}")
+                        return None
+                    data = await resp.read()
+        except Exception as e:
+            log.warning(f"[media-cache] Falha ao baixar {url}: {e}")
+            return None
+
+        entry = MediaEntry(hashlib.sha256(data).hexdigest(), data, _guess_mime(url))
+        entry = self._store(key, entry)
+        if self.disk_dir:
+            await asyncio.get_running_loop().run_in_executor(None, self._disk_save, key, entry)
+        return entry
+
+
+# Cache único por processo (sobrevive entre transcripts)
+media_cache = MediaCache()
@@ -0,0 +1,155 @@
+# ==========================================================
+# utils/ratelimit.py — limitador de envios compartilhado pelos cogs
+# GCRA (token bucket sem timer) em time.monotonic(): O(1) por chamada,
+# buckets por rota + chave (canal/usuário/guild), espera em vez de descartar
+# ==========================================================
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Hashable, Tuple
+
+from utils import env
+
+log = logging.getLogger("ratelimit")
+
+# buckets ociosos (cheios) são descartados quando o mapa passa deste tamanho
+_PRUNE_AT = 2048
+
+
+@dataclass
+class RouteMetrics:
+    acquired: int = 0       # permissões concedidas
+    waited: int = 0         # quantas tiveram que esperar
+    wait_seconds: float = 0.0
+    max_wait: float = 0.0
+
+
+class Bucket:
+    """GCRA: guarda só o "theoretical arrival time". `rate` por segundo, rajada de `burst`."""
+
+    __slots__ = ("interval", "burst", "_tat", "_clock")
+
+    def __init__(self, rate: float, burst: int, clock: Callable[[], float] = time.monotonic):
+        self.interval = 1.0 / max(rate, 1e-6)
+        self.burst = max(1, burst)
+        self._tat = 0.0
+        self._clock = clock
+
+    def reserve(self, cost: int = 1) -> float:
+        """Reserva a vaga (ordem de chegada) e devolve quantos segundos esperar."""
+        now = self._clock()
+        tat = max(self._tat, now) + cost * self.interval
+        self._tat = tat
+        return max(0.0, tat - now - self.burst * self.interval)
+
+    def peek(self, cost: int = 1) -> float:
+        """Espera necessária agora, sem reservar."""
+        now = self._clock()
+        tat = max(self._tat, now) + cost * self.interval
+        return max(0.0, tat - now - self.burst * self.interval)
+
+    def idle(self, now: float) -> bool:
+        return self._tat <= now
+
+
+class RateLimiter:
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._routes: Dict[str, Tuple[float, int]] = {}
+        self._global: Dict[str, bool] = {}
+        self._buckets: Dict[Tuple[str, Hashable], Bucket] = {}
+        self._metrics: Dict[str, RouteMetrics] = {}
+
+    def configure(self, route: str, rate: float, burst: int, *, charge_global: bool = True):
+        """Define (ou redefine) o limite da rota; buckets existentes passam a usar o novo valor.
+        `charge_global=False` para cotas de política (ex.: "log") que sempre vêm seguidas de um
+        send()/call() — o bucket global já é cobrado lá, uma vez só."""
+        self._routes[route] = (rate, burst)
+        self._global[route] = charge_global and route != "global"
+        for (r, _), bucket in self._buckets.items():
+            if r == route:
+                bucket.interval = 1.0 / max(rate, 1e-6)
+                bucket.burst = max(1, burst)
+
+    def bucket(self, route: str, key: Hashable = None) -> Bucket:
+        b = self._buckets.get((route, key))
+        if b is None:
+            if route not in self._routes:
+                raise KeyError(f"Rota de rate limit não configurada: {route}")
+            if len(self._buckets) >= _PRUNE_AT:
+                self._prune()
+            b = self._buckets[(route, key)] = Bucket(*self._routes[route], clock=self._clock)
+        return b
+
+    def _prune(self):
+        now = self._clock()
+        for k in [k for k, b in self._buckets.items() if b.idle(now)]:
+            del self._buckets[k]
+
+    async def acquire(self, route: str, key: Hashable = None, cost: int = 1):
+        """Espera a vez na rota/chave e no bucket global (limite do Discord por bot)."""
+        wait = self.bucket(route, key).reserve(cost)
+        if self._global.get(route):
+            wait = max(wait, self.bucket("global").reserve(cost))
+        m = self._metrics.setdefault(route, RouteMetrics())
+        m.acquired += 1
+        if wait > 0:
+            m.waited += 1
+            m.wait_seconds += wait
+            m.max_wait = max(m.max_wait, wait)
+            if wait >= 5:
+                log.debug(f"[ratelimit] {route}:{key} aguardando {wait:.1f}s")
+            await asyncio.sleep(wait)
+
+    def would_wait(self, route: str, key: Hashable = None, cost: int = 1) -> float:
+        return self.bucket(route, key).peek(cost)
+
+    def metrics(self) -> Dict[str, Dict[str, float]]:
+        """Snapshot por rota (para logs/diagnóstico)."""
+        return {
+            route: {
+                "acquired": m.acquired,
+                "waited": m.waited,
+                "wait_seconds": round(m.wait_seconds, 3),
+                "max_wait": round(m.max_wait, 3),
+                "buckets": sum(1 for (r, _) in self._buckets if r == route),
+            }
+            for route, m in self._metrics.items()
+        }
+
+
+limiter = RateLimiter()
+
+# ===== Rotas padrão (limites do Discord com folga) =====
+limiter.configure("global", env.get_int("RATELIMIT_GLOBAL_PER_SECOND", 40), env.get_int("RATELIMIT_GLOBAL_BURST", 40))
+# envio em canal: o Discord aceita ~5 mensagens a cada 5s por canal
+limiter.configure("channel", float(env.get("RATELIMIT_CHANNEL_PER_SECOND", "1") or 1), env.get_int("RATELIMIT_CHANNEL_BURST", 5))
+limiter.configure("dm", float(env.get("RATELIMIT_DM_PER_SECOND", "0.5") or 0.5), env.get_int("RATELIMIT_DM_BURST", 2))
+# edições de membro (cargos) por guild
+limiter.configure("member", float(env.get("RATELIMIT_MEMBER_PER_SECOND", "2") or 2), env.get_int("RATELIMIT_MEMBER_BURST", 5))
+# criação de canais e afins por guild
+limiter.configure("guild", float(env.get("RATELIMIT_GUILD_PER_SECOND", "1") or 1), env.get_int("RATELIMIT_GUILD_BURST", 5))
+
+
+def _route_for(destination) -> Tuple[str, Hashable]:
+    """Usuário/membro/DM → rota "dm" por usuário; o resto → "channel" por canal."""
+    if getattr(destination, "recipient", None) is not None or hasattr(destination, "discriminator"):
+        return "dm", getattr(destination, "id", None)
+    return "channel", getattr(destination, "id", None)
+
+
+async def send(destination, **kwargs):
+    """destination.send(**kwargs) respeitando o bucket do canal/usuário e o global."""
+    route, key = _route_for(destination)
+    await limiter.acquire(route, key)
+    return await destination.send(**kwargs)
+
+
+async def call(route: str, key: Hashable, coro_fn, *args, **kwargs):
+    """Qualquer outra chamada REST (editar, apagar, cargos…) passando pelo limitador."""
+    await limiter.acquire(route, key)
+    return await coro_fn(*args, **kwargs)
@@ -0,0 +1,132 @@
+# ==========================================================
+# utils/ticket_capture.py — captura incremental dos tickets
+# mensagens/edições/exclusões gravadas em SQLite conforme chegam,
+# para o fechamento só renderizar (e buscar via REST apenas o gap)
+# ==========================================================
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sqlite3
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from utils import env
+
+log = logging.getLogger("ticket_capture")
+
+LIVE_CAPTURE: bool = env.get_bool("TICKET_LIVE_CAPTURE", False)
+
+
+class TicketCapture:
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        # conexão preguiçosa (só quando o primeiro evento chega)
+        if self._conn is None:
+            self._conn = self._connect()
+        return self._conn
+
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        db = sqlite3.connect(self.path, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            """CREATE TABLE IF NOT EXISTS captured (
+                channel_id INTEGER NOT NULL,
+                message_id INTEGER NOT NULL,
+                payload TEXT NOT NULL,
+                deleted INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (channel_id, message_id)
+            )"""
+        )
+        # trechos (em snowflakes) em que o bot esteve fora e a captura pode ter perdido eventos
+        db.execute(
+            """CREATE TABLE IF NOT EXISTS gaps (
+                start_id INTEGER NOT NULL,
+                end_id INTEGER NOT NULL
+            )"""
+        )
+        db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        return db
+
+    def upsert(self, channel_id: int, message_id: int, payload: Dict):
+        self._db.execute(
+            "INSERT INTO captured (channel_id, message_id, payload) VALUES (?, ?, ?)"
+            " ON CONFLICT(channel_id, message_id) DO UPDATE SET payload = excluded.payload",
+            (channel_id, message_id, json.dumps(payload, ensure_ascii=False)),
+        )
+
+    def update(self, channel_id: int, message_id: int, **changes) -> bool:
+        """Aplica uma edição num payload já capturado. False se a mensagem não estiver na base."""
+        row = self._db.execute(
+            "SELECT payload FROM captured WHERE channel_id = ? AND message_id = ?",
+            (channel_id, message_id),
+        ).fetchone()
+        if not row:
+            return False
+        payload = json.loads(row[0])
+        payload.update(changes)
+        self.upsert(channel_id, message_id, payload)
+        return True
+
+    def mark_deleted(self, channel_id: int, message_ids: Iterable[int]):
+        self._db.executemany(
+            "UPDATE captured SET deleted = 1 WHERE channel_id = ? AND message_id = ?",
+            [(channel_id, mid) for mid in message_ids],
+        )
+
+    def load(self, channel_id: int) -> Tuple[List[Dict], Optional[int], Optional[int]]:
+        """Mensagens vivas em ordem + (primeiro, último) ID capturados (inclui apagadas)."""
+        rows = self._db.execute(
+            "SELECT message_id, payload, deleted FROM captured WHERE channel_id = ? ORDER BY message_id",
+            (channel_id,),
+        ).fetchall()
+        if not rows:
+            return [], None, None
+        msgs = [json.loads(payload) for _, payload, deleted in rows if not deleted]
+        return msgs, rows[0][0], rows[-1][0]
+
+    # ---------- continuidade da captura ----------
+    def mark_alive(self, snowflake: int):
+        """Último instante (snowflake) em que a captura com certeza estava recebendo eventos."""
+        self._db.execute(
+            "INSERT INTO meta (key, value) VALUES ('alive', ?)"
+            " ON CONFLICT(key) DO UPDATE SET value = MAX(value, excluded.value)",
+            (snowflake,),
+        )
+
+    def open_gap(self, now_snowflake: int):
+        """Captura voltou (nova sessão no gateway): de último sinal de vida até agora pode faltar coisa.
+        Sinal de vida = desconexão registrada ou a mensagem capturada mais recente (cobre crash)."""
+        row = self._db.execute(
+            "SELECT MAX(COALESCE((SELECT value FROM meta WHERE key = 'alive'), 0),"
+            " COALESCE((SELECT MAX(message_id) FROM captured), 0))"
+        ).fetchone()
+        alive = int(row[0] or 0)
+        if alive and alive < now_snowflake:
+            self._db.execute("INSERT INTO gaps (start_id, end_id) VALUES (?, ?)", (alive, now_snowflake))
+        self.mark_alive(now_snowflake)
+        # lacunas anteriores a tudo que ainda está capturado não servem mais
+        self._db.execute(
+            "DELETE FROM gaps WHERE end_id < COALESCE((SELECT MIN(message_id) FROM captured), end_id + 1)"
+        )
+
+    def gaps_for(self, first_id: int, last_id: int) -> List[Tuple[int, int]]:
+        """Lacunas que cortam o trecho capturado (first_id, last_id) de um canal."""
+        return [
+            (int(a), int(b)) for a, b in self._db.execute(
+                "SELECT start_id, end_id FROM gaps WHERE end_id > ? AND start_id < ? ORDER BY start_id",
+                (first_id, last_id),
+            )
+        ]
+
+    def drop(self, channel_id: int):
+        self._db.execute("DELETE FROM captured WHERE channel_id = ?", (channel_id,))
+
+
+capture = TicketCapture(os.path.join(env.data_dir(), "ticket_capture.db")) if LIVE_CAPTURE else None